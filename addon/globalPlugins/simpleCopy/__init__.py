@@ -10,12 +10,13 @@ import scriptHandler
 import addonHandler
 import controlTypes
 import textInfos
-import time
 import logging
 import gui
 import wx
 import ctypes
-import core
+import os
+import threading
+import ui
 from ui import message as ui_message
 import tones
 from . import url_utils
@@ -23,6 +24,11 @@ from . import clipboard_utils
 from . import speech_utils
 from . import reviewCursor
 from . import url_history
+from . import settings
+from . import speech_search
+from . import timing_utils
+from . import input_utils
+from . import clipboard_history
 
 log = logging.getLogger("nvda.simpleCopy")
 
@@ -35,67 +41,133 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 	isTextCopied = False
 	_double_tap_threshold = 0.5
 
-	_ctrl_shift_a_tap_count = 0
-	_ctrl_shift_a_last_tap_time = 0
-	_ctrl_shift_a_timer = None
-
-	_ctrl_shift_v_tap_count = 0
-	_ctrl_shift_v_last_tap_time = 0
-	_ctrl_shift_v_timer = None
-
-	_f9_tap_count = 0
-	_f9_last_tap_time = 0
-	_f9_timer = None
-
-	_shift_f9_tap_count = 0
-	_shift_f9_last_tap_time = 0
-	_shift_f9_timer = None
-
 	_captured_speech_buffer = []
 	_is_recording_active = False
 
 	def __init__(self):
 		super().__init__()
-		self.clipboard_handler = clipboard_utils.ClipboardHandler()
-		self.url_handler = url_utils.URLHandler()
+		settings.initialize()
+		gui.settingsDialogs.NVDASettingsDialog.categoryClasses.append(settings.SimpleCopySettingsPanel)
+		self.strategy_timings = timing_utils.StrategyTimings()
+		self.clipboard_handler = clipboard_utils.ClipboardHandler(timings=self.strategy_timings)
+		self.url_handler = url_utils.URLHandler(timings=self.strategy_timings)
+		self._speech_echo_dedup = speech_utils.EchoDeduplicator()
+		# The capture worker fills the buffer while the F9 scripts read and reset it on the main thread.
+		self._speech_buffer_lock = threading.Lock()
 		self.speech_history = speech_utils.SpeechHistoryHandler(callback=self._on_speech_received)
 		self.review_cursor_handler = reviewCursor.ReviewCursorHandler()
 		self.url_history_handler = url_history.URLHistoryManager()
 		self.url_history_dialog = None
+		self._link_harvest = None
+		self._link_harvest_index = 0
+		self.speech_search_dialog = None
+		self.clipboard_history = None
+		self.clipboard_listener = None
+		self.clipboard_history_dialog = None
+		self._shift_f9_undo_index = None
+		self.tap_dispatcher = input_utils.MultiTapDispatcher(self._double_tap_threshold)
+		self.tap_dispatcher.register(
+			"control+shift+v",
+			(self._handle_single_tap, self._handle_double_tap, self._clearClipboard)
+		)
+		self.tap_dispatcher.register(
+			"control+shift+a",
+			(self._copyBrowserUrl, self._copyHyperlinkUrl, self.show_url_history)
+		)
+		self.tap_dispatcher.register(
+			"f9",
+			(self._handle_f9_single, self._handle_f9_double, self._handle_f9_triple)
+		)
+		# Moving back through history is cheap to undo, so it runs on the first tap.
+		self.tap_dispatcher.register(
+			"shift+f9",
+			(self._navigate_history_backward, self._navigate_history_forward, self.speech_history.open_history_file),
+			speculative=True,
+			undo_single=self._undo_navigate_history_backward
+		)
+		self._tap_timing_path = os.path.join(self.speech_history.history_dir, "tapTiming.json")
+		self.tap_dispatcher.load_intervals(self._tap_timing_path)
+		self._app_profiles_path = os.path.join(self.speech_history.history_dir, "appProfiles.json")
+		self.strategy_timings.profiles.load(self._app_profiles_path)
+		self.apply_settings()
+		settings.post_settingsSave.register(self.apply_settings)
 		log.info("SimpleCopy: Module initialized")
 
-	def _is_state_echo_duplicate(self, previous_text, current_text):
-		if not previous_text or not current_text:
-			return False
-		previous_without_checkbox_role = previous_text.replace(" check box", " ").strip()
-		previous_tokens = set(previous_without_checkbox_role.lower().split())
-		current_tokens = set(current_text.lower().split())
-		return bool(previous_tokens) and previous_tokens.issubset(current_tokens)
+	def apply_settings(self):
+		self.tap_dispatcher.adaptive = settings.get("adaptiveTapTiming")
+		self.clipboard_handler.dedup_appends = settings.get("dedupAppends")
+		self.url_handler.set_browser_apps(settings.get("browserApps"))
+		self.speech_history.set_budget(settings.get("speechHistoryBudgetKB") * 1024)
+		self.speech_history.set_persistent(
+			settings.get("persistSpeechHistory"),
+			retention_days=settings.get("speechArchiveDays")
+		)
+		self._set_clipboard_history_enabled(settings.get("clipboardHistory"))
+		if self.clipboard_history:
+			self.clipboard_history.set_budget(settings.get("clipboardHistoryBudgetKB") * 1024)
+
+	def _set_clipboard_history_enabled(self, enabled):
+		if enabled and not self.clipboard_history:
+			self.clipboard_history = clipboard_history.ClipboardHistory()
+			self.clipboard_listener = clipboard_history.ClipboardListener(self.clipboard_history)
+			self.clipboard_handler.clipboard_listener = self.clipboard_listener
+		elif not enabled and self.clipboard_history:
+			self.clipboard_handler.clipboard_listener = None
+			self.clipboard_listener.destroy()
+			self.clipboard_listener = None
+			self.clipboard_history.close()
+			self.clipboard_history = None
+
+	# Any of these means cached review-copy text for the document may be stale.
+	# documentLoadComplete also means a new page, so its cached URL is dropped too.
+	def event_textChange(self, obj, nextHandler):
+		self.review_cursor_handler.invalidate(obj)
+		nextHandler()
+
+	def event_valueChange(self, obj, nextHandler):
+		self.review_cursor_handler.invalidate(obj)
+		nextHandler()
+
+	def event_documentLoadComplete(self, obj, nextHandler):
+		self.review_cursor_handler.invalidate(obj)
+		self.url_handler.invalidate_url(obj)
+		self.url_handler.schedule_prefetch(obj)
+		nextHandler()
+
+	def event_gainFocus(self, obj, nextHandler):
+		self.url_handler.schedule_prefetch(obj)
+		nextHandler()
+
+	def event_nameChange(self, obj, nextHandler):
+		# A document's name is its page title, which changes when a single-page app navigates.
+		# nameChange fires constantly and role is a cross-process call, so it is read last.
+		if (
+			self.url_handler.has_cached_urls()
+			and self.url_handler.is_browser_app(obj)
+			and obj.role == controlTypes.Role.DOCUMENT
+		):
+			self.url_handler.invalidate_url(obj)
+		nextHandler()
 
 	def _on_speech_received(self, text):
 		clean_text = text.strip()
-		if not self._is_recording_active or not clean_text:
+		if not clean_text:
 			return
-
-		if self._captured_speech_buffer and self._is_state_echo_duplicate(
-			self._captured_speech_buffer[-1], clean_text
-		):
-			self._captured_speech_buffer[-1] = clean_text
-		else:
-			self._captured_speech_buffer.append(clean_text)
-
-	def _performAppendAction(self, obj):
-		try:
-			selected_text = self.clipboard_handler.get_selected_text(obj)
-			if not selected_text:
-				speech.speak([_("No text selected to append")])
+		with self._speech_buffer_lock:
+			if not self._is_recording_active:
 				return
+			if self._speech_echo_dedup.advance(clean_text) and self._captured_speech_buffer:
+				self._captured_speech_buffer[-1] = clean_text
+			else:
+				self._captured_speech_buffer.append(clean_text)
 
+	def _performAppendAction(self, selected_text):
+		try:
 			result = self.clipboard_handler.append_to_clipboard(selected_text)
 			if result["success"]:
 				self.isTextCopied = True
 				appended_char_count = len(selected_text)
-				total_char_count = len(result.get("fullText", selected_text))
+				total_char_count = result.get("totalLength", appended_char_count)
 				char_label = _("character") if appended_char_count == 1 else _("characters")
 				total_label = _("character") if total_char_count == 1 else _("characters")
 
@@ -124,8 +196,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 				user32.EmptyClipboard()
 				user32.CloseClipboard()
 				self.isTextCopied = False
-				self._captured_speech_buffer.clear()
-				self._is_recording_active = False
+				self._stop_speech_recording()
 				speech.speak([_("Clean")])
 			else:
 				tones.beep(200, 100)
@@ -139,38 +210,32 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		category=scriptCategory
 	)
 	def script_handleTextCopy(self, gesture):
-		current_time = time.time()
-		if current_time - self._ctrl_shift_v_last_tap_time > self._double_tap_threshold:
-			self._ctrl_shift_v_tap_count = 0
-
-		self._ctrl_shift_v_tap_count += 1
-		self._ctrl_shift_v_last_tap_time = current_time
-
-		if self._ctrl_shift_v_timer and self._ctrl_shift_v_timer.IsRunning():
-			self._ctrl_shift_v_timer.Stop()
-
-		self._ctrl_shift_v_timer = core.callLater(int(self._double_tap_threshold * 1000), self._execute_v_action)
-
-	def _execute_v_action(self):
-		if self._ctrl_shift_v_tap_count == 1:
-			self._handle_single_tap()
-		elif self._ctrl_shift_v_tap_count == 2:
-			self._handle_double_tap()
-		elif self._ctrl_shift_v_tap_count >= 3:
-			self._clearClipboard()
-		self._ctrl_shift_v_tap_count = 0
+		# Pressing again while a long review copy is running cancels it.
+		if self.review_cursor_handler.cancel():
+			speech.speak([_("Copy cancelled")])
+			return
+		self.tap_dispatcher.tap("control+shift+v")
 
 	def _handle_single_tap(self):
 		obj = api.getFocusObject()
-		selected_text = self.clipboard_handler.get_selected_text(obj)
+		self.clipboard_handler.get_selected_text_async(obj, self._onSelectionForAppend)
+
+	def _onSelectionForAppend(self, selected_text):
 		if not selected_text:
 			keyboardHandler.KeyboardInputGesture.fromName("control+shift+c").send()
 		else:
-			self._performAppendAction(obj)
+			self._performAppendAction(selected_text)
 
 	def _handle_double_tap(self):
-		text = self.review_cursor_handler.copy_from_review_cursor()
-		if text:
+		if not self.review_cursor_handler.copy_from_review_cursor_async(self._onReviewTextCopied):
+			tones.beep(200, 100)
+			speech.speak([_("No text at review cursor")])
+
+	def _onReviewTextCopied(self, text, failed=False):
+		if failed:
+			tones.beep(200, 100)
+			speech.speak([_("Copy failed")])
+		elif text:
 			if api.copyToClip(text):
 				tones.beep(1500, 100)
 				char_count = len(text)
@@ -191,26 +256,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		category=scriptCategory
 	)
 	def script_copyUrlOrHyperlink(self, gesture):
-		current_time = time.time()
-		if current_time - self._ctrl_shift_a_last_tap_time > self._double_tap_threshold:
-			self._ctrl_shift_a_tap_count = 0
-
-		self._ctrl_shift_a_tap_count += 1
-		self._ctrl_shift_a_last_tap_time = current_time
-
-		if self._ctrl_shift_a_timer and self._ctrl_shift_a_timer.IsRunning():
-			self._ctrl_shift_a_timer.Stop()
-
-		self._ctrl_shift_a_timer = core.callLater(int(self._double_tap_threshold * 1000), self._execute_a_action)
-
-	def _execute_a_action(self):
-		if self._ctrl_shift_a_tap_count == 1:
-			self._copyBrowserUrl()
-		elif self._ctrl_shift_a_tap_count == 2:
-			self._copyHyperlinkUrl()
-		elif self._ctrl_shift_a_tap_count >= 3:
-			self.show_url_history()
-		self._ctrl_shift_a_tap_count = 0
+		self.tap_dispatcher.tap("control+shift+a")
 
 	def _copyBrowserUrl(self):
 		obj = api.getFocusObject()
@@ -243,31 +289,64 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		else:
 			keyboardHandler.KeyboardInputGesture.fromName("control+shift+a").send()
 
+	@scriptHandler.script(
+		# Translators: Describes a command that adds the URL of every link on a web page to URL history.
+		description=_("Add all links on the page, or in the selection, to URL history"),
+		category=scriptCategory
+	)
+	def script_collectLinks(self, gesture):
+		if self._link_harvest and self._link_harvest.cancel():
+			self._link_harvest = None
+			self.url_history_handler.save()
+			# Translators: Reported when collecting links is cancelled.
+			ui_message(_("Link collection cancelled"))
+			return
+		obj = api.getFocusObject()
+		self._link_harvest_index = 0
+		self._link_harvest = self.url_handler.harvest_links(obj, self._onLinksHarvested, self._onLinkHarvestDone)
+		if self._link_harvest is None:
+			# Translators: Reported when links are to be collected outside a web page.
+			ui_message(_("Not in a web page"))
+			return
+		if not self._link_harvest.finished:
+			wx.CallAfter(self.show_url_history)
+
+	def _onLinksHarvested(self, urls):
+		# Links go in page order after those found earlier in the same walk.
+		self._link_harvest_index += self.url_history_handler.add_items(urls, index=self._link_harvest_index, save=False)
+		self._refresh_url_history_dialog()
+
+	def _onLinkHarvestDone(self, count, limit_reached):
+		self._link_harvest = None
+		if not count:
+			# Translators: Reported when collecting links found none on the page or in the selection.
+			ui_message(_("No link found"))
+			return
+		self.url_history_handler.save()
+		self._refresh_url_history_dialog()
+		if limit_reached:
+			# Translators: Reported when collecting links stopped at the limit before the end of the page;
+			# {count} is the number of links added.
+			ui_message(_("Limit reached, {count} links added to URL history").format(count=count))
+			return
+		# Translators: Reported after links were added to URL history; {count} is their number.
+		ui_message(_("{count} links added to URL history").format(count=count))
+
+	def _refresh_url_history_dialog(self):
+		try:
+			if self.url_history_dialog and self.url_history_dialog.IsShown():
+				self.url_history_dialog.update_list()
+		except RuntimeError:
+			# The dialog was closed and destroyed.
+			self.url_history_dialog = None
+
 	@scriptHandler.script(
 		description=_("copy last speech (single) append last speech (double) copy until last speech (triple)"),
 		gesture="kb:f9",
 		category=scriptCategory
 	)
 	def script_copySpeech(self, gesture):
-		current_time = time.time()
-		if current_time - self._f9_last_tap_time > self._double_tap_threshold:
-			self._f9_tap_count = 0
-		self._f9_tap_count += 1
-		self._f9_last_tap_time = current_time
-
-		if self._f9_timer and self._f9_timer.IsRunning():
-			self._f9_timer.Stop()
-
-		self._f9_timer = core.callLater(int(self._double_tap_threshold * 1000), self._execute_f9_action)
-
-	def _execute_f9_action(self):
-		if self._f9_tap_count == 1:
-			self._handle_f9_single()
-		elif self._f9_tap_count == 2:
-			self._handle_f9_double()
-		elif self._f9_tap_count >= 3:
-			self._handle_f9_triple()
-		self._f9_tap_count = 0
+		self.tap_dispatcher.tap("f9")
 
 	def _handle_f9_single(self):
 		seq = self.speech_history.get_latest_sequence()
@@ -278,9 +357,11 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		text_version = self.speech_history.get_latest_text()
 		if api.copyToClip(text_version):
 			tones.beep(1500, 100)
-			self._captured_speech_buffer.clear()
-			self._captured_speech_buffer.append(text_version)
-			self._is_recording_active = True
+			with self._speech_buffer_lock:
+				self._captured_speech_buffer.clear()
+				self._captured_speech_buffer.append(text_version)
+				self._speech_echo_dedup.reset(text_version)
+				self._is_recording_active = True
 
 	def _handle_f9_double(self):
 		text = self.speech_history.get_latest_text()
@@ -291,14 +372,25 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			speech.speak([_("Append")])
 
 	def _handle_f9_triple(self):
-		if not self._is_recording_active or not self._captured_speech_buffer:
+		self.speech_history.flush()
+		with self._speech_buffer_lock:
+			if not self._is_recording_active or not self._captured_speech_buffer:
+				combined_text = None
+			else:
+				combined_text = "\n".join(self._captured_speech_buffer)
+		if combined_text is None:
 			tones.beep(200, 100)
 			return
 
-		combined_text = "\n".join(self._captured_speech_buffer)
 		if api.copyToClip(combined_text):
+			# Stop before speaking, so the confirmation is not captured into the buffer.
+			self._stop_speech_recording()
 			speech.speak([_("Copy Until Last")])
+
+	def _stop_speech_recording(self):
+		with self._speech_buffer_lock:
 			self._captured_speech_buffer.clear()
+			self._speech_echo_dedup.reset()
 			self._is_recording_active = False
 
 	@scriptHandler.script(
@@ -307,34 +399,21 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		category=scriptCategory
 	)
 	def script_navigateSpeechHistory(self, gesture):
-		current_time = time.time()
-		if current_time - self._shift_f9_last_tap_time > self._double_tap_threshold:
-			self._shift_f9_tap_count = 0
-
-		self._shift_f9_tap_count += 1
-		self._shift_f9_last_tap_time = current_time
-
-		if self._shift_f9_timer and self._shift_f9_timer.IsRunning():
-			self._shift_f9_timer.Stop()
-
-		self._shift_f9_timer = core.callLater(int(self._double_tap_threshold * 1000), self._execute_shift_f9_action)
-
-	def _execute_shift_f9_action(self):
-		if self._shift_f9_tap_count == 1:
-			self._navigate_history_backward()
-		elif self._shift_f9_tap_count == 2:
-			self._navigate_history_forward()
-		elif self._shift_f9_tap_count >= 3:
-			self.speech_history.open_history_file()
-		self._shift_f9_tap_count = 0
+		self.tap_dispatcher.tap("shift+f9")
 
 	def _navigate_history_backward(self):
+		self._shift_f9_undo_index = self.speech_history.navigator.current_index
 		seq = self.speech_history.get_previous_sequence()
 		if seq is not None:
 			speech.speak(seq)
 		else:
 			tones.beep(200, 100)
 
+	def _undo_navigate_history_backward(self):
+		if self._shift_f9_undo_index is not None:
+			self.speech_history.navigator.current_index = self._shift_f9_undo_index
+			self._shift_f9_undo_index = None
+
 	def _navigate_history_forward(self):
 		seq = self.speech_history.get_next_sequence()
 		if seq is not None:
@@ -342,6 +421,76 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		else:
 			tones.beep(200, 100)
 
+	@scriptHandler.script(
+		description=_("Search speech history"),
+		gesture="kb:control+shift+f9",
+		category=scriptCategory
+	)
+	def script_searchSpeechHistory(self, gesture):
+		wx.CallAfter(self.show_speech_search)
+
+	def show_speech_search(self):
+		if self.speech_search_dialog:
+			try:
+				if self.speech_search_dialog.IsShown():
+					self.speech_search_dialog.Raise()
+					return
+			except RuntimeError:
+				pass
+		self.speech_search_dialog = speech_search.SpeechSearchDialog(gui.mainFrame, self.speech_history)
+		gui.mainFrame.prePopup()
+		self.speech_search_dialog.Show()
+		self.speech_search_dialog.CentreOnScreen()
+		self.speech_search_dialog.Raise()
+		gui.mainFrame.postPopup()
+
+	@scriptHandler.script(
+		description=_("Reset the learned multi-tap delay"),
+		category=scriptCategory
+	)
+	def script_resetTapTiming(self, gesture):
+		self.tap_dispatcher.reset_learning()
+		self.tap_dispatcher.save_intervals(self._tap_timing_path)
+		ui_message(_("Multi-tap delay reset"))
+
+	@scriptHandler.script(
+		description=_("Report how long URL and selection retrieval strategies take"),
+		category=scriptCategory
+	)
+	def script_reportRetrievalTimings(self, gesture):
+		report = self.strategy_timings.report()
+		if not report:
+			ui_message(_("No retrieval timings recorded yet"))
+			return
+		self.strategy_timings.dump_to_log()
+		ui.browseableMessage(report, _("Simple Copy retrieval timings"))
+
+	@scriptHandler.script(
+		description=_("Show clipboard history"),
+		category=scriptCategory
+	)
+	def script_showClipboardHistory(self, gesture):
+		if not self.clipboard_history:
+			# Translators: Reported when clipboard history is turned off in settings.
+			ui_message(_("Clipboard history is off. Turn it on in Simple Copy settings."))
+			return
+		wx.CallAfter(self.show_clipboard_history)
+
+	def show_clipboard_history(self):
+		if self.clipboard_history_dialog:
+			try:
+				if self.clipboard_history_dialog.IsShown():
+					self.clipboard_history_dialog.Raise()
+					return
+			except RuntimeError:
+				pass
+		self.clipboard_history_dialog = clipboard_history.ClipboardHistoryDialog(gui.mainFrame, self.clipboard_history)
+		gui.mainFrame.prePopup()
+		self.clipboard_history_dialog.Show()
+		self.clipboard_history_dialog.CentreOnScreen()
+		self.clipboard_history_dialog.Raise()
+		gui.mainFrame.postPopup()
+
 	def show_url_history(self):
 		if self.url_history_dialog and self.url_history_dialog.IsShown():
 			self.url_history_dialog.Raise()
@@ -355,9 +504,32 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		log.info("URL History dialog shown")
 
 	def terminate(self):
+		settings.post_settingsSave.unregister(self.apply_settings)
+		try:
+			gui.settingsDialogs.NVDASettingsDialog.categoryClasses.remove(settings.SimpleCopySettingsPanel)
+		except ValueError:
+			pass
 		self.speech_history.restore_patch()
+		self.review_cursor_handler.cancel()
+		self.url_handler.cancel_prefetch()
+		if self._link_harvest:
+			self._link_harvest.cancel()
+		self.strategy_timings.dump_to_log()
+		self.strategy_timings.profiles.save(self._app_profiles_path)
+		self.tap_dispatcher.save_intervals(self._tap_timing_path)
 		if self.url_history_dialog:
 			self.url_history_dialog.Destroy()
+		if self.speech_search_dialog:
+			try:
+				self.speech_search_dialog.Destroy()
+			except RuntimeError:
+				pass
+		if self.clipboard_history_dialog:
+			try:
+				self.clipboard_history_dialog.Destroy()
+			except RuntimeError:
+				pass
+		self._set_clipboard_history_enabled(False)
 		if hasattr(self, "url_history_handler"):
 			self.url_history_handler.save(immediate=True)
 		super().terminate()
\ No newline at end of file
@@ -0,0 +1,375 @@
+# clipboard_history.py
+
+import os
+import sys
+import time
+import zlib
+import shutil
+import threading
+import logging
+from collections import deque
+import addonHandler
+import globalVars
+import windowUtils
+import winUser
+import wx
+import core
+import api
+import ui
+import speech
+
+addonHandler.initTranslation()
+log = logging.getLogger("nvda.simpleCopy.clipboardHistory")
+
+WM_CLIPBOARDUPDATE = 0x031D
+DEFAULT_CLIPBOARD_HISTORY_BUDGET_BYTES = 2 * 1024 * 1024
+MAX_CLIPBOARD_HISTORY_ENTRIES = 1000
+# Texts longer than this are kept zlib-compressed.
+COMPRESS_THRESHOLD_CHARS = 2048
+# Compressed texts larger than this are written to disk and only their preview stays in memory.
+SPILL_THRESHOLD_BYTES = 256 * 1024
+PREVIEW_CHARS = 120
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class ClipboardHistoryEntry:
+	__slots__ = ("timestamp", "length", "preview", "size", "_text", "_compressed", "_path")
+
+	def __init__(self, timestamp, length, preview):
+		self.timestamp = timestamp
+		self.length = length
+		self.preview = preview
+		self.size = 0
+		self._text = None
+		self._compressed = None
+		self._path = None
+
+	def get_text(self):
+		if self._text is not None:
+			return self._text
+		if self._compressed is not None:
+			return zlib.decompress(self._compressed).decode("utf-8")
+		with open(self._path, "rb") as f:
+			return zlib.decompress(f.read()).decode("utf-8")
+
+	def discard(self):
+		if self._path:
+			try:
+				os.remove(self._path)
+			except OSError as e:
+				log.warning(f"Could not delete spilled clipboard entry {self._path}: {e}")
+			self._path = None
+
+
+def _make_preview(text):
+	line = text.strip().split("\n", 1)[0].strip()
+	if len(line) > PREVIEW_CHARS:
+		line = line[:PREVIEW_CHARS] + "..."
+	return line
+
+
+class ClipboardHistory:
+	"""Text copied during this session, newest first, within a memory budget.
+
+	Short texts are kept as they are, longer ones compressed, and the largest
+	written to a spill directory that is emptied at startup. The oldest entries
+	are dropped when the estimated memory use passes budget_bytes. Compression
+	and spilling happen on a worker thread so the clipboard listener returns at
+	once.
+	"""
+
+	def __init__(self, budget_bytes=DEFAULT_CLIPBOARD_HISTORY_BUDGET_BYTES, spill_dir=None):
+		self.budget_bytes = budget_bytes
+		self.spill_dir = spill_dir or os.path.join(
+			globalVars.appArgs.configPath, "ChaiChaimee", "simpleCopy", "clipboardHistory"
+		)
+		self._lock = threading.Lock()
+		self._entries = deque()
+		self._total_bytes = 0
+		self._newest_key = None
+		self._next_spill_id = 0
+		self._pending = deque()
+		self._process_lock = threading.Lock()
+		self._pending_event = threading.Event()
+		self._worker = None
+		self._stopped = False
+		shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+	def __len__(self):
+		return len(self._entries)
+
+	def get_entries(self):
+		"""The stored entries, newest first, as a list that later changes do not affect."""
+		with self._lock:
+			return list(self._entries)
+
+	def set_budget(self, budget_bytes):
+		with self._lock:
+			self.budget_bytes = budget_bytes
+			self._evict_over_budget()
+
+	def add(self, text):
+		"""Queues text for storage; repeats of the newest entry are ignored."""
+		if not text:
+			return
+		key = (len(text), hash(text))
+		if key == self._newest_key:
+			return
+		self._newest_key = key
+		self._pending.append((time.time(), text))
+		if self._worker is None:
+			self._worker = threading.Thread(target=self._run, name="simpleCopy.clipboardHistory", daemon=True)
+			self._worker.start()
+		if not self._pending_event.is_set():
+			self._pending_event.set()
+
+	def flush(self):
+		"""Stores everything queued so far on the calling thread."""
+		with self._process_lock:
+			while True:
+				try:
+					timestamp, text = self._pending.popleft()
+				except IndexError:
+					return
+				self._store(timestamp, text)
+
+	def _run(self):
+		while not self._stopped:
+			self._pending_event.wait()
+			self._pending_event.clear()
+			try:
+				self.flush()
+			except Exception as e:
+				log.error(f"Storing clipboard history failed: {e}")
+
+	def _store(self, timestamp, text):
+		entry = ClipboardHistoryEntry(timestamp, len(text), _make_preview(text))
+		if len(text) <= COMPRESS_THRESHOLD_CHARS:
+			entry._text = text
+			entry.size = ENTRY_OVERHEAD_BYTES + sys.getsizeof(text)
+		else:
+			compressed = zlib.compress(text.encode("utf-8"), 1)
+			if len(compressed) > SPILL_THRESHOLD_BYTES and self._spill(entry, compressed):
+				entry.size = ENTRY_OVERHEAD_BYTES + sys.getsizeof(entry.preview)
+			else:
+				entry._compressed = compressed
+				entry.size = ENTRY_OVERHEAD_BYTES + sys.getsizeof(entry.preview) + len(compressed)
+		with self._lock:
+			self._entries.appendleft(entry)
+			self._total_bytes += entry.size
+			self._evict_over_budget()
+
+	def _spill(self, entry, compressed):
+		try:
+			if not os.path.isdir(self.spill_dir):
+				os.makedirs(self.spill_dir)
+			self._next_spill_id += 1
+			path = os.path.join(self.spill_dir, f"entry_{self._next_spill_id:08d}.z")
+			with open(path, "wb") as f:
+				f.write(compressed)
+		except OSError as e:
+			log.error(f"Could not spill clipboard entry to disk: {e}")
+			return False
+		entry._path = path
+		return True
+
+	def _evict_over_budget(self):
+		entries = self._entries
+		while len(entries) > 1 and (
+			self._total_bytes > self.budget_bytes or len(entries) > MAX_CLIPBOARD_HISTORY_ENTRIES
+		):
+			entry = entries.pop()
+			self._total_bytes -= entry.size
+			entry.discard()
+
+	def remove(self, entry):
+		with self._lock:
+			try:
+				self._entries.remove(entry)
+			except ValueError:
+				return
+			self._total_bytes -= entry.size
+			entry.discard()
+			self._newest_key = None
+
+	def clear(self):
+		with self._lock:
+			for entry in self._entries:
+				entry.discard()
+			self._entries.clear()
+			self._total_bytes = 0
+			self._newest_key = None
+
+	def close(self):
+		self._stopped = True
+		self._pending.clear()
+		self._pending_event.set()
+		if self._worker is not None:
+			self._worker.join(timeout=1.0)
+			self._worker = None
+		# Holding the process lock waits out a store still running on the worker,
+		# so nothing is added or spilled after the entries and spill files are gone.
+		with self._process_lock:
+			self.clear()
+			shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+class ClipboardListener(windowUtils.CustomWindow):
+	"""Hidden window that Windows notifies whenever the clipboard changes.
+
+	Changes are ignored while paused, so the add-on's own temporary use of the
+	clipboard, such as the Ctrl+C fallback, is not recorded.
+	"""
+	className = "simpleCopyClipboardListener"
+
+	def __init__(self, history):
+		super().__init__("simpleCopy clipboard listener")
+		self.history = history
+		self._paused = 0
+		self._pause_lock = threading.Lock()
+		if not winUser.user32.AddClipboardFormatListener(self.handle):
+			log.error("AddClipboardFormatListener failed; clipboard history will stay empty")
+
+	def windowProc(self, hwnd, msg, wParam, lParam):
+		if msg == WM_CLIPBOARDUPDATE:
+			if not self._paused:
+				self._record()
+			return 0
+
+	def pause(self):
+		with self._pause_lock:
+			self._paused += 1
+
+	def resume(self):
+		"""Ends a pause; called from any thread. What is on the clipboard now is recorded."""
+		with self._pause_lock:
+			self._paused -= 1
+			resumed = not self._paused
+		if resumed:
+			wx.CallAfter(self._record)
+
+	def _record(self):
+		if self._paused:
+			return
+		try:
+			with winUser.openClipboard(self.handle):
+				text = winUser.getClipboardData(winUser.CF_UNICODETEXT)
+		except Exception as e:
+			log.debug(f"Could not read clipboard for history: {e}")
+			return
+		if text and isinstance(text, str):
+			self.history.add(text)
+
+	def destroy(self):
+		winUser.user32.RemoveClipboardFormatListener(self.handle)
+		super().destroy()
+
+
+class ClipboardHistoryDialog(wx.Dialog):
+	def __init__(self, parent, history):
+		super().__init__(parent, title=_("Clipboard History"), size=(600, 400),
+						 style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER | wx.STAY_ON_TOP)
+		self.history = history
+		self._entries = []
+		self._initUi()
+		self.update_list()
+		self.Centre()
+		self.Bind(wx.EVT_CLOSE, self._onClose)
+		self.Bind(wx.EVT_CHAR_HOOK, self._onChar)
+		self.Bind(wx.EVT_SHOW, self._onShow)
+
+	def _initUi(self):
+		panel = wx.Panel(self)
+		sizer = wx.BoxSizer(wx.VERTICAL)
+
+		self.listCtrl = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL | wx.LC_NO_HEADER)
+		self.listCtrl.InsertColumn(0, _("Text"), width=550)
+		sizer.Add(self.listCtrl, 1, wx.EXPAND | wx.ALL, 5)
+
+		panel.SetSizer(sizer)
+
+		self.listCtrl.Bind(wx.EVT_LIST_ITEM_RIGHT_CLICK, self._onContextMenu)
+		self.listCtrl.Bind(wx.EVT_CONTEXT_MENU, self._onContextMenu)
+		self.listCtrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self._onActivate)
+
+	def update_list(self):
+		selected = self.listCtrl.GetFirstSelected()
+		self.history.flush()
+		self._entries = self.history.get_entries()
+		self.listCtrl.DeleteAllItems()
+		for idx, entry in enumerate(self._entries):
+			# Translators: A clipboard history entry: its first line and its length.
+			label = _("{preview}, {count} characters").format(preview=entry.preview, count=entry.length)
+			self.listCtrl.InsertItem(idx, label)
+		count = self.listCtrl.GetItemCount()
+		if count:
+			selected = min(max(selected, 0), count - 1)
+			self.listCtrl.Select(selected)
+			self.listCtrl.Focus(selected)
+			self.listCtrl.EnsureVisible(selected)
+
+	def _onShow(self, event):
+		if event.IsShown():
+			wx.CallAfter(self._focusFirstItem)
+		event.Skip()
+
+	def _focusFirstItem(self):
+		if self.listCtrl.GetItemCount() > 0:
+			self.listCtrl.SetFocus()
+			self.listCtrl.Select(0)
+			self.listCtrl.Focus(0)
+
+	def _onActivate(self, event):
+		idx = self.listCtrl.GetFirstSelected()
+		if idx == -1 or idx >= len(self._entries):
+			return
+		entry = self._entries[idx]
+		try:
+			text = entry.get_text()
+		except (OSError, zlib.error, UnicodeDecodeError) as e:
+			log.error(f"Could not read clipboard history entry: {e}")
+			speech.speak([_("Copy failed")])
+			return
+		if api.copyToClip(text):
+			self.Close()
+			core.callLater(50, speech.speak, [_("Copy"), entry.preview])
+		else:
+			speech.speak([_("Copy failed")])
+			wx.CallAfter(self.Close)
+
+	def _onDelete(self, event):
+		idx = self.listCtrl.GetFirstSelected()
+		if 0 <= idx < len(self._entries):
+			self.history.remove(self._entries[idx])
+			self.update_list()
+			ui.message(_("Deleted"))
+
+	def _onClear(self, event):
+		self.history.clear()
+		self.update_list()
+		ui.message(_("Cleared"))
+
+	def _onContextMenu(self, event):
+		menu = wx.Menu()
+		clearItem = menu.Append(wx.ID_ANY, _("Clear"))
+		self.Bind(wx.EVT_MENU, self._onClear, clearItem)
+		if self.listCtrl.GetFirstSelected() != -1:
+			deleteItem = menu.Append(wx.ID_ANY, _("Delete"))
+			self.Bind(wx.EVT_MENU, self._onDelete, deleteItem)
+		self.listCtrl.PopupMenu(menu)
+		menu.Destroy()
+
+	def _onChar(self, event):
+		key = event.GetKeyCode()
+		if key == wx.WXK_RETURN:
+			self._onActivate(event)
+			return
+		elif key == wx.WXK_DELETE:
+			self._onDelete(event)
+		elif key == wx.WXK_ESCAPE:
+			self.Close()
+		else:
+			event.Skip()
+
+	def _onClose(self, event):
+		self.Destroy()
@@ -0,0 +1,131 @@
+# clipboard_snapshot.py
+
+import ctypes
+from ctypes.wintypes import BOOL, HANDLE, UINT
+import logging
+import winUser
+
+log = logging.getLogger("nvda.simpleCopy.clipboardSnapshot")
+
+GMEM_MOVEABLE = 0x0002
+CF_TEXT = 1
+CF_OEMTEXT = 7
+# Formats whose data is a GDI or metafile handle rather than global memory. Windows
+# synthesises CF_BITMAP from CF_DIB, and the rest are rarely put on the clipboard.
+HANDLE_FORMATS = frozenset((2, 3, 9, 14, 0x80, 0x82, 0x83, 0x8E))
+# Windows regenerates these from CF_UNICODETEXT, so they are not worth copying.
+SYNTHESIZED_TEXT_FORMATS = frozenset((CF_TEXT, CF_OEMTEXT))
+
+# Private instances, so the prototypes below do not change the function objects
+# NVDA and other add-ons share through winUser.user32 and winKernel.kernel32.
+_user32 = ctypes.WinDLL("user32")
+_kernel32 = ctypes.WinDLL("kernel32")
+# The default int return type would truncate 64-bit handles and pointers.
+_user32.GetClipboardData.restype = HANDLE
+_user32.GetClipboardData.argtypes = (UINT,)
+_user32.SetClipboardData.restype = HANDLE
+_user32.SetClipboardData.argtypes = (UINT, HANDLE)
+_user32.EnumClipboardFormats.restype = UINT
+_user32.EnumClipboardFormats.argtypes = (UINT,)
+_kernel32.GlobalAlloc.restype = HANDLE
+_kernel32.GlobalAlloc.argtypes = (UINT, ctypes.c_size_t)
+_kernel32.GlobalLock.restype = ctypes.c_void_p
+_kernel32.GlobalLock.argtypes = (HANDLE,)
+_kernel32.GlobalUnlock.restype = BOOL
+_kernel32.GlobalUnlock.argtypes = (HANDLE,)
+_kernel32.GlobalSize.restype = ctypes.c_size_t
+_kernel32.GlobalSize.argtypes = (HANDLE,)
+_kernel32.GlobalFree.restype = HANDLE
+_kernel32.GlobalFree.argtypes = (HANDLE,)
+
+
+def _read_global(handle):
+	"""Copies the contents of a global memory handle into a bytes object."""
+	size = _kernel32.GlobalSize(handle)
+	if not size:
+		return None
+	pointer = _kernel32.GlobalLock(handle)
+	if not pointer:
+		return None
+	try:
+		return ctypes.string_at(pointer, size)
+	finally:
+		_kernel32.GlobalUnlock(handle)
+
+
+def _alloc_global(data):
+	handle = _kernel32.GlobalAlloc(GMEM_MOVEABLE, len(data))
+	if not handle:
+		raise MemoryError("GlobalAlloc failed")
+	pointer = _kernel32.GlobalLock(handle)
+	if not pointer:
+		_kernel32.GlobalFree(handle)
+		raise MemoryError("GlobalLock failed")
+	try:
+		ctypes.memmove(pointer, data, len(data))
+	finally:
+		_kernel32.GlobalUnlock(handle)
+	return handle
+
+
+class ClipboardSnapshot:
+	"""Every memory-backed format on the clipboard, copied once so it can be put back.
+
+	Each format is held as a single immutable bytes object, read straight out of
+	the clipboard's global memory; restoring copies it into fresh global memory
+	without any intermediate buffer. The clipboard sequence number at capture
+	time tells restore_if_changed whether anything needs putting back at all.
+	"""
+
+	def __init__(self, formats, sequence_number):
+		self.formats = formats
+		self.sequence_number = sequence_number
+
+	@classmethod
+	def capture(cls, owner):
+		with winUser.openClipboard(owner):
+			sequence_number = _user32.GetClipboardSequenceNumber()
+			available = []
+			format_id = _user32.EnumClipboardFormats(0)
+			while format_id:
+				available.append(format_id)
+				format_id = _user32.EnumClipboardFormats(format_id)
+			skipped = set(HANDLE_FORMATS)
+			if winUser.CF_UNICODETEXT in available:
+				skipped.update(SYNTHESIZED_TEXT_FORMATS)
+			formats = []
+			for format_id in available:
+				if format_id in skipped:
+					continue
+				handle = _user32.GetClipboardData(format_id)
+				if not handle:
+					continue
+				data = _read_global(handle)
+				if data is not None:
+					formats.append((format_id, data))
+		return cls(formats, sequence_number)
+
+	@property
+	def size(self):
+		return sum(len(data) for format_id, data in self.formats)
+
+	def changed(self):
+		return _user32.GetClipboardSequenceNumber() != self.sequence_number
+
+	def restore(self, owner):
+		with winUser.openClipboard(owner):
+			winUser.emptyClipboard()
+			for format_id, data in self.formats:
+				handle = _alloc_global(data)
+				# On success the clipboard owns the memory; otherwise it is still ours to free.
+				if not _user32.SetClipboardData(format_id, handle):
+					_kernel32.GlobalFree(handle)
+					log.warning(f"Could not restore clipboard format {format_id}")
+		self.sequence_number = _user32.GetClipboardSequenceNumber()
+
+	def restore_if_changed(self, owner):
+		"""Puts the snapshot back only if something replaced the clipboard since capture."""
+		if not self.changed():
+			return False
+		self.restore(owner)
+		return True
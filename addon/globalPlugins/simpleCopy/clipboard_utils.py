@@ -13,34 +13,88 @@ import browseMode
 import logging
 import hashlib
 import sys
+import threading
+import wx
+from .clipboard_snapshot import ClipboardSnapshot
+from .text_utils import clean_text, iter_chunks, normalize_chunks, normalize_text, to_windows_line_endings
+from .timing_utils import StrategyTimings, get_app_name
+
+# How long the Ctrl+C fallback waits for each attempt to reach the clipboard, in seconds.
+COPY_WAIT_TIMEOUT_2025 = 0.25
+COPY_WAIT_TIMEOUT_2026 = 0.15
+CLIPBOARD_POLL_INTERVAL = 0.005
 
 class ClipboardHandler:
 	
-	def __init__(self):
+	def __init__(self, timings=None):
 		self.logger = logging.getLogger(__name__)
+		self.timings = timings if timings is not None else StrategyTimings()
+		# Read once on the main thread; the Ctrl+C fallback may run on a worker.
+		self._clipboard_owner = gui.mainFrame.Handle
+		self.accumulator = ClipboardAccumulator()
+		# When set, text already appended since the clipboard was last changed elsewhere is skipped.
+		self.dedup_appends = False
+		# Paused while the Ctrl+C fallback borrows the clipboard, so clipboard history ignores it.
+		self.clipboard_listener = None
+		# One Ctrl+C fallback at a time, so a second press cannot copy between another's snapshot and restore.
+		self._copy_lock = threading.Lock()
 	
 	def normalize_text(self, text):
-		if not text:
-			return ""
-		text = "".join(char for char in text if char.isprintable() or char in {"\r", "\n", " "})
-		text = text.replace("\r\n", "\n").replace("\r", "\n")
-		return text
+		return normalize_text(text)
 	
 	def calculate_sha256(self, text):
-		normalized_text = self.normalize_text(text)
-		return hashlib.sha256(normalized_text.encode('utf-8')).hexdigest()
+		# Hashed piece by piece, so a large selection is never copied whole to normalize or encode it.
+		digest = hashlib.sha256()
+		for chunk in normalize_chunks(iter_chunks(text)):
+			digest.update(chunk.encode('utf-8'))
+		return digest.hexdigest()
+	
+	def get_selected_text_async(self, obj_param, callback):
+		"""Gets the selected text, trying each strategy in turn.
+		
+		Strategies that use TextInfo run on the main thread; the Ctrl+C fallback
+		waits on a background thread. callback receives the text, or None, on the
+		main thread.
+		"""
+		strategies, copy_strategy = self._get_selection_strategies()
+		app = get_app_name(obj_param)
+		selected_text = self._run_selection_strategies(app, obj_param, strategies)
+		if selected_text:
+			callback(selected_text)
+			return
+		
+		def _copyInBackground():
+			text = self._run_selection_strategies(app, obj_param, (copy_strategy,))
+			if not text:
+				self.logger.info("No selected text found.")
+			wx.CallAfter(callback, text)
+		
+		threading.Thread(target=_copyInBackground, name="simpleCopy.copySelection", daemon=True).start()
 	
-	def get_selected_text(self, obj_param):
+	def _get_selection_strategies(self):
+		"""Returns the strategies that must run on the main thread, and the Ctrl+C fallback."""
 		if sys.version_info >= (3, 13):
-			return self._get_selected_text_2026(obj_param)
-		else:
-			return self._get_selected_text_2025(obj_param)
+			self.logger.info("SimpleCopy: get_selected_text_async started (2026).")
+			return (
+				("treeInterceptor.selection", self._get_tree_interceptor_selection),
+				("makeTextInfo", self._get_text_info_selection_2026),
+			), ("Ctrl+C", self._copy_selection_2026)
+		self.logger.info("SimpleCopy: get_selected_text_async started (2025).")
+		return (
+			("makeTextInfo", self._get_text_info_selection_2025),
+		), ("Ctrl+C", self._copy_selection_2025)
 	
-	def _get_selected_text_2025(self, obj_param):
-		self.logger.info("SimpleCopy: get_selected_text started (2025).")
-		current_obj = obj_param
+	def _run_selection_strategies(self, app, obj_param, strategies):
+		for name, strategy in self.timings.order("selection", app, strategies):
+			with self.timings.measure("selection", app, name) as measurement:
+				selected_text = strategy(obj_param)
+				measurement.success = bool(selected_text)
+			if selected_text:
+				return selected_text
+		return None
+	
+	def _get_text_info_selection_2025(self, current_obj):
 		selected_text = None
-		
 		try:
 			target_obj_for_text = None
 			if hasattr(current_obj, 'treeInterceptor') and isinstance(current_obj.treeInterceptor, browseMode.BrowseModeDocumentTreeInterceptor):
@@ -56,7 +110,7 @@ class ClipboardHandler:
 						selected_text = info.clipboardText
 						if selected_text:
 							self.logger.info(f"makeTextInfo retrieved: {repr(selected_text[:50])}...")
-							return selected_text.replace('\r\n', '\n').replace('\r', '\n').strip()
+							return clean_text(selected_text)
 				except (RuntimeError, NotImplementedError) as e:
 					self.logger.warning(f"makeTextInfo selection failed: {str(e)}")
 			else:
@@ -64,44 +118,14 @@ class ClipboardHandler:
 		
 		except Exception as e_info:
 			self.logger.error(f"Error with makeTextInfo attempt: {str(e_info)}")
-		
-		self.logger.info("makeTextInfo failed, attempting Ctrl+C fallback.")
-		original_clipboard_data = ""
-		try:
-			with winUser.openClipboard(gui.mainFrame.Handle):
-				original_clipboard_data = winUser.getClipboardData(winUser.CF_UNICODETEXT) or ""
-				winUser.emptyClipboard()
-			
-			keyboardHandler.injectKey("control+c")
-			time.sleep(0.05)
-			
-			with winUser.openClipboard(gui.mainFrame.Handle):
-				clipboard_text = winUser.getClipboardData(winUser.CF_UNICODETEXT) or ""
-			
-			if clipboard_text:
-				selected_text = clipboard_text
-				self.logger.info(f"Ctrl+C fallback retrieved: {repr(selected_text[:50])}...")
-				return selected_text.replace('\r\n', '\n').replace('\r', '\n').strip()
-		
-		except Exception as e_fallback:
-			self.logger.error(f"Ctrl+C fallback failed: {str(e_fallback)}")
-		finally:
-			try:
-				with winUser.openClipboard(gui.mainFrame.Handle):
-					winUser.emptyClipboard()
-					if original_clipboard_data:
-						winUser.setClipboardData(winUser.CF_UNICODETEXT, original_clipboard_data)
-			except Exception as e_restore:
-				self.logger.error(f"Failed to restore clipboard: {str(e_restore)}")
-		
-		self.logger.info("No selected text found (2025).")
 		return None
 	
-	def _get_selected_text_2026(self, obj_param):
-		self.logger.info("SimpleCopy: get_selected_text started (2026).")
-		current_obj = obj_param
+	def _copy_selection_2025(self, current_obj):
+		self.logger.info("makeTextInfo failed, attempting Ctrl+C fallback.")
+		return self._copy_selection(attempts=1, timeout=COPY_WAIT_TIMEOUT_2025)
+	
+	def _get_tree_interceptor_selection(self, current_obj):
 		selected_text = None
-		
 		try:
 			if hasattr(current_obj, 'treeInterceptor') and current_obj.treeInterceptor:
 				ti = current_obj.treeInterceptor
@@ -114,10 +138,13 @@ class ClipboardHandler:
 							selected_text = sel.text
 						if selected_text:
 							self.logger.info(f"treeInterceptor.selection.clipboardText/text success: {repr(selected_text[:50])}")
-							return selected_text.replace('\r\n', '\n').replace('\r', '\n').strip()
+							return clean_text(selected_text)
 		except Exception as e:
 			self.logger.warning(f"treeInterceptor selection failed: {e}")
-		
+		return None
+	
+	def _get_text_info_selection_2026(self, current_obj):
+		selected_text = None
 		try:
 			target_obj_for_text = None
 			if hasattr(current_obj, 'treeInterceptor') and isinstance(current_obj.treeInterceptor, browseMode.BrowseModeDocumentTreeInterceptor):
@@ -136,7 +163,7 @@ class ClipboardHandler:
 							selected_text = info.text
 						if selected_text:
 							self.logger.info(f"makeTextInfo.clipboardText/text success: {repr(selected_text[:50])}...")
-							return selected_text.replace('\r\n', '\n').replace('\r', '\n').strip()
+							return clean_text(selected_text)
 				except (RuntimeError, NotImplementedError) as e:
 					self.logger.warning(f"makeTextInfo selection failed: {str(e)}")
 			else:
@@ -144,76 +171,103 @@ class ClipboardHandler:
 		
 		except Exception as e_info:
 			self.logger.error(f"Error with makeTextInfo attempt: {str(e_info)}")
-		
+		return None
+	
+	def _copy_selection_2026(self, current_obj):
 		self.logger.info("Falling back to Ctrl+C method (2026).")
-		original_clipboard_data = ""
-		for attempt in range(3):
+		return self._copy_selection(attempts=3, timeout=COPY_WAIT_TIMEOUT_2026)
+	
+	def _wait_for_clipboard_change(self, sequence_number, deadline):
+		"""Waits until the clipboard sequence number moves past sequence_number.
+		
+		Returns as soon as the application has put new data on the clipboard, or
+		False once the perf_counter deadline has passed.
+		"""
+		while True:
+			if winUser.user32.GetClipboardSequenceNumber() != sequence_number:
+				return True
+			if time.perf_counter() >= deadline:
+				return False
+			time.sleep(CLIPBOARD_POLL_INTERVAL)
+	
+	def _read_clipboard_text(self, owner, deadline):
+		"""Reads the copied text, retrying until the perf_counter deadline.
+		
+		The sequence number moves when the application empties the clipboard, so
+		it may still hold the clipboard open, or not have set the text yet, on
+		the first try.
+		"""
+		while True:
 			try:
-				with winUser.openClipboard(gui.mainFrame.Handle):
-					original_clipboard_data = winUser.getClipboardData(winUser.CF_UNICODETEXT) or ""
-					winUser.emptyClipboard()
-				
-				keyboardHandler.injectKey("control+c")
-				time.sleep(0.1)
-				
-				with winUser.openClipboard(gui.mainFrame.Handle):
-					clipboard_text = winUser.getClipboardData(winUser.CF_UNICODETEXT) or ""
-				
+				with winUser.openClipboard(owner):
+					clipboard_text = winUser.getClipboardData(winUser.CF_UNICODETEXT)
 				if clipboard_text:
-					selected_text = clipboard_text
-					self.logger.info(f"Ctrl+C fallback attempt {attempt+1} retrieved: {repr(selected_text[:50])}...")
-					return selected_text.replace('\r\n', '\n').replace('\r', '\n').strip()
-			except Exception as e_fallback:
-				self.logger.warning(f"Ctrl+C fallback attempt {attempt+1} failed: {str(e_fallback)}")
-				time.sleep(0.05)
+					return clipboard_text
+			except OSError as e_open:
+				self.logger.debug(f"Clipboard not readable yet: {str(e_open)}")
+			if time.perf_counter() >= deadline:
+				return None
+			time.sleep(CLIPBOARD_POLL_INTERVAL)
+	
+	def _copy_selection(self, attempts, timeout):
+		with self._copy_lock:
+			listener = self.clipboard_listener
+			if listener is not None:
+				listener.pause()
+			try:
+				return self._copy_selection_preserving_clipboard(attempts, timeout)
 			finally:
+				if listener is not None:
+					listener.resume()
+	
+	def _copy_selection_preserving_clipboard(self, attempts, timeout):
+		owner = self._clipboard_owner
+		try:
+			snapshot = ClipboardSnapshot.capture(owner)
+		except Exception as e_snapshot:
+			# Without a snapshot the copy would destroy whatever the user had on the clipboard.
+			self.logger.warning(f"Could not snapshot clipboard, skipping Ctrl+C fallback: {str(e_snapshot)}")
+			return None
+		try:
+			for attempt in range(attempts):
 				try:
-					with winUser.openClipboard(gui.mainFrame.Handle):
-						winUser.emptyClipboard()
-						if original_clipboard_data:
-							winUser.setClipboardData(winUser.CF_UNICODETEXT, original_clipboard_data)
-				except Exception as e_restore:
-					self.logger.warning(f"Failed to restore clipboard: {str(e_restore)}")
-		
-		self.logger.info("No selected text found (2026).")
+					sequence_number = winUser.user32.GetClipboardSequenceNumber()
+					keyboardHandler.injectKey("control+c")
+					deadline = time.perf_counter() + timeout
+					if not self._wait_for_clipboard_change(sequence_number, deadline):
+						self.logger.info(f"Ctrl+C fallback attempt {attempt+1}: clipboard did not change within {timeout}s")
+						continue
+					
+					clipboard_text = self._read_clipboard_text(owner, deadline)
+					if clipboard_text:
+						selected_text = clipboard_text
+						self.logger.info(f"Ctrl+C fallback attempt {attempt+1} retrieved: {repr(selected_text[:50])}...")
+						return clean_text(selected_text)
+				except Exception as e_fallback:
+					self.logger.warning(f"Ctrl+C fallback attempt {attempt+1} failed: {str(e_fallback)}")
+		finally:
+			try:
+				snapshot.restore_if_changed(owner)
+			except Exception as e_restore:
+				self.logger.warning(f"Failed to restore clipboard: {str(e_restore)}")
 		return None
 	
 	def append_to_clipboard(self, text_to_append):
-		clipData = ""
 		try:
-			with winUser.openClipboard(gui.mainFrame.Handle):
-				clipData = winUser.getClipboardData(winUser.CF_UNICODETEXT) or ""
-				if clipData and not isinstance(clipData, str):
-					return {
-						"success": False,
-						"appended": False,
-						"message": _("Cannot append to non-text clipboard content"),
-						"fullText": ""
-					}
-		except Exception as e:
-			self.logger.error(f"Error reading clipboard: {str(e)}")
-			clipData = ""
-		
-		processed_text_to_append = text_to_append
-		
-		if clipData:
-			clipData_normalized = clipData.replace('\r\n', '\n').replace('\r', '\n').rstrip('\n')
-			processed_text_to_append_normalized = processed_text_to_append.replace('\r\n', '\n').replace('\r', '\n').lstrip('\n')
-			newText = clipData_normalized + "\n" + processed_text_to_append_normalized
-			appended = True
-		else:
-			newText = processed_text_to_append.replace('\r\n', '\n').replace('\r', '\n')
-			appended = False
-		
-		try:
-			with winUser.openClipboard(gui.mainFrame.Handle):
-				winUser.emptyClipboard()
-				winUser.setClipboardData(winUser.CF_UNICODETEXT, newText.replace('\n', '\r\n'))
+			appended = self._append(text_to_append)
+		except NonTextClipboardError:
+			return {
+				"success": False,
+				"appended": False,
+				"message": _("Cannot append to non-text clipboard content"),
+				"totalLength": 0
+			}
+		except DuplicateAppendError:
 			return {
-				"success": True,
-				"appended": appended,
-				"message": _("Appended") if appended else _("Copied"),
-				"fullText": newText
+				"success": False,
+				"appended": False,
+				"message": _("Already appended"),
+				"totalLength": len(self.accumulator)
 			}
 		except Exception as e:
 			self.logger.error(f"Error writing to clipboard: {str(e)}")
@@ -221,35 +275,140 @@ class ClipboardHandler:
 				"success": False,
 				"appended": False,
 				"message": _("Error writing to clipboard"),
-				"fullText": ""
+				"totalLength": 0
 			}
+		return {
+			"success": True,
+			"appended": appended,
+			"message": _("Appended") if appended else _("Copied"),
+			"totalLength": len(self.accumulator)
+		}
 	
 	def append_text_silent(self, text_to_append):
-		clipData = ""
 		try:
-			with winUser.openClipboard(gui.mainFrame.Handle):
-				clipData = winUser.getClipboardData(winUser.CF_UNICODETEXT) or ""
-				if clipData and not isinstance(clipData, str):
-					self.logger.warning("Clipboard contains non-text data, cannot append")
-					return False
+			self._append(text_to_append)
+			return True
+		except NonTextClipboardError:
+			self.logger.warning("Clipboard contains non-text data, cannot append")
+		except DuplicateAppendError:
+			self.logger.info("append_text_silent: text was already appended, skipping")
 		except Exception as e:
-			self.logger.error(f"append_text_silent: Error reading clipboard: {e}")
-			clipData = ""
-		
-		processed_text_to_append = text_to_append
-		
-		if clipData:
-			clipData_normalized = clipData.replace('\r\n', '\n').replace('\r', '\n').rstrip('\n')
-			processed_text_to_append_normalized = processed_text_to_append.replace('\r\n', '\n').replace('\r', '\n').lstrip('\n')
-			newText = clipData_normalized + "\n" + processed_text_to_append_normalized
-		else:
-			newText = processed_text_to_append.replace('\r\n', '\n').replace('\r', '\n')
+			self.logger.error(f"append_text_silent: Error writing to clipboard: {e}")
+		return False
+	
+	def _append(self, text_to_append):
+		"""Appends to the clipboard text and writes the result back.
 		
+		The clipboard is only read when its sequence number shows that something
+		other than this add-on changed it since the last append. Returns whether
+		the text was appended to existing content rather than copied.
+		"""
+		owner = self._clipboard_owner
+		if not self.accumulator.is_current(winUser.user32.GetClipboardSequenceNumber()):
+			clipData = ""
+			try:
+				with winUser.openClipboard(owner):
+					clipData = winUser.getClipboardData(winUser.CF_UNICODETEXT) or ""
+			except Exception as e:
+				self.logger.error(f"Error reading clipboard: {str(e)}")
+				clipData = ""
+			if clipData and not isinstance(clipData, str):
+				raise NonTextClipboardError()
+			self.accumulator.reset(clipData)
+		text_hash = None
+		if self.dedup_appends:
+			text_hash = self.calculate_sha256(text_to_append)
+			if self.accumulator.has_hash(text_hash):
+				raise DuplicateAppendError()
+		appended = bool(self.accumulator)
+		self.accumulator.append(text_to_append, text_hash)
 		try:
-			with winUser.openClipboard(gui.mainFrame.Handle):
+			with winUser.openClipboard(owner):
 				winUser.emptyClipboard()
-				winUser.setClipboardData(winUser.CF_UNICODETEXT, newText.replace('\n', '\r\n'))
-			return True
-		except Exception as e:
-			self.logger.error(f"append_text_silent: Error writing to clipboard: {e}")
-			return False
\ No newline at end of file
+				winUser.setClipboardData(winUser.CF_UNICODETEXT, self.accumulator.get_text())
+		except Exception:
+			self.accumulator.invalidate()
+			raise
+		self.accumulator.sequence_number = winUser.user32.GetClipboardSequenceNumber()
+		return appended
+
+
+class NonTextClipboardError(Exception):
+	pass
+
+
+class DuplicateAppendError(Exception):
+	pass
+
+
+class ClipboardAccumulator:
+	"""The clipboard text built up by appends, kept as chunks of Windows-style text.
+	
+	Each chunk is normalized once, when it is added, and its content hash is
+	remembered when dedup is on. sequence_number is the
+	clipboard sequence number right after the accumulated text was last
+	written; any other value means the clipboard was changed elsewhere and the
+	chunks are stale.
+	"""
+	
+	def __init__(self):
+		self._chunks = []
+		self._length = 0
+		self._hashes = set()
+		self.sequence_number = None
+	
+	def __len__(self):
+		"""Length of the accumulated text with single-character line breaks."""
+		return self._length
+	
+	def __bool__(self):
+		return bool(self._chunks)
+	
+	def is_current(self, sequence_number):
+		return self.sequence_number is not None and sequence_number == self.sequence_number
+	
+	def invalidate(self):
+		self.sequence_number = None
+	
+	def reset(self, text=""):
+		self._chunks = []
+		self._length = 0
+		self._hashes = set()
+		self.sequence_number = None
+		if text:
+			self._add_chunk(to_windows_line_endings(text))
+	
+	def has_hash(self, text_hash):
+		return text_hash in self._hashes
+	
+	def append(self, text, text_hash=None):
+		if text_hash is not None:
+			self._hashes.add(text_hash)
+		chunk = to_windows_line_endings(text)
+		if self._chunks:
+			self._rstrip_line_breaks()
+			chunk = "\r\n" + chunk.lstrip('\r\n')
+		self._add_chunk(chunk)
+	
+	def get_text(self):
+		if len(self._chunks) > 1:
+			self._chunks = ["".join(self._chunks)]
+		return self._chunks[0] if self._chunks else ""
+	
+	def _add_chunk(self, chunk):
+		if not chunk:
+			return
+		self._chunks.append(chunk)
+		self._length += len(chunk) - chunk.count('\r\n')
+	
+	def _rstrip_line_breaks(self):
+		while self._chunks:
+			chunk = self._chunks[-1]
+			stripped = chunk.rstrip('\r\n')
+			if stripped is chunk:
+				return
+			self._length -= (len(chunk) - len(stripped)) // 2
+			if stripped:
+				self._chunks[-1] = stripped
+				return
+			self._chunks.pop()
@@ -4,7 +4,23 @@ import addonHandler
 addonHandler.initTranslation()
 
 import wx
+import os
+import json
 import time
+import logging
+from collections import deque
+import core
+
+log = logging.getLogger("nvda.simpleCopy.input")
+
+# Bounds for the learned multi-tap delay, in seconds.
+TAP_THRESHOLD_MIN = 0.2
+TAP_THRESHOLD_MAX = 0.5
+TAP_INTERVAL_SAMPLES = 20
+TAP_MIN_SAMPLES = 5
+# The delay is set this far above the user's slower double taps.
+TAP_THRESHOLD_FACTOR = 1.3
+TAP_THRESHOLD_MARGIN = 0.05
 
 class InputHandler:
 	
@@ -30,4 +46,112 @@ class InputHandler:
 	
 	def clear_pending_key(self, key_name):
 		if key_name in self.pending_key_press:
-			self.pending_key_press[key_name] = None
\ No newline at end of file
+			self.pending_key_press[key_name] = None
+
+class _TapState:
+	def __init__(self, actions, speculative, undo_single):
+		self.actions = actions
+		self.speculative = speculative
+		self.undo_single = undo_single
+		self.tap_count = 0
+		self.last_tap_time = 0
+		self.timer = None
+		self.speculated = False
+		self.intervals = deque(maxlen=TAP_INTERVAL_SAMPLES)
+
+
+class MultiTapDispatcher:
+	"""Counts repeated presses of a gesture and runs the action for the final count.
+
+	actions[0] runs on a single tap, actions[1] on a double tap and so on; more
+	taps than actions run the last one. Normally the action runs once the
+	threshold has passed without another tap. When adaptive, each gesture's
+	threshold is learned from the recent gaps between its taps. A speculative
+	gesture runs its single-tap action straight away instead, and calls
+	undo_single if a second tap turns out to follow.
+	"""
+
+	def __init__(self, threshold=0.5, adaptive=False):
+		self.threshold = threshold
+		self.adaptive = adaptive
+		self._gestures = {}
+
+	def register(self, name, actions, speculative=False, undo_single=None):
+		self._gestures[name] = _TapState(actions, speculative, undo_single)
+
+	def _threshold(self, state):
+		if not self.adaptive or len(state.intervals) < TAP_MIN_SAMPLES:
+			return self.threshold
+		intervals = sorted(state.intervals)
+		slow_tap = intervals[int(0.9 * (len(intervals) - 1))]
+		learned = slow_tap * TAP_THRESHOLD_FACTOR + TAP_THRESHOLD_MARGIN
+		return min(TAP_THRESHOLD_MAX, max(TAP_THRESHOLD_MIN, learned))
+
+	def tap(self, name):
+		state = self._gestures[name]
+		threshold = self._threshold(state)
+		current_time = time.time()
+		interval = current_time - state.last_tap_time
+		# Gaps just over the threshold are sampled too, including a re-tap after the
+		# single action already ran, so a threshold that is too short can grow again.
+		if state.last_tap_time and interval <= TAP_THRESHOLD_MAX:
+			state.intervals.append(interval)
+		if interval > threshold:
+			state.tap_count = 0
+			state.speculated = False
+
+		state.tap_count += 1
+		state.last_tap_time = current_time
+
+		if state.timer and state.timer.IsRunning():
+			state.timer.Stop()
+
+		if state.tap_count == 1 and state.speculative:
+			state.speculated = True
+			state.actions[0]()
+		elif state.tap_count == 2 and state.speculated and state.undo_single:
+			state.undo_single()
+
+		state.timer = core.callLater(int(threshold * 1000), self._execute, state)
+
+	def reset_learning(self):
+		for state in self._gestures.values():
+			state.intervals.clear()
+
+	def load_intervals(self, path):
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				loaded = json.load(f)
+		except FileNotFoundError:
+			return
+		except (OSError, ValueError) as e:
+			log.error(f"Failed to load tap timing: {e}")
+			return
+		if not isinstance(loaded, dict):
+			return
+		for name, intervals in loaded.items():
+			state = self._gestures.get(name)
+			if state and isinstance(intervals, list):
+				state.intervals.extend(
+					float(interval) for interval in intervals
+					if isinstance(interval, (int, float)) and 0 < interval <= TAP_THRESHOLD_MAX
+				)
+
+	def save_intervals(self, path):
+		data = {name: list(state.intervals) for name, state in self._gestures.items() if state.intervals}
+		try:
+			temp_path = f"{path}.tmp"
+			with open(temp_path, "w", encoding="utf-8") as f:
+				json.dump(data, f)
+			os.replace(temp_path, path)
+		except OSError as e:
+			log.error(f"Failed to save tap timing: {e}")
+
+	def _execute(self, state):
+		tap_count = state.tap_count
+		speculated = state.speculated
+		state.tap_count = 0
+		state.speculated = False
+		if tap_count < 1 or (tap_count == 1 and speculated):
+			return
+		state.actions[min(tap_count, len(state.actions)) - 1]()
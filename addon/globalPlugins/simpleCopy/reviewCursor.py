@@ -1,97 +1,320 @@
 # reviewCursor.py
 
+import time
+import weakref
+from collections import OrderedDict
 import api
 import textInfos
+import tones
+import core
 import logging
+from .text_utils import TextNormalizer
 
 logger = logging.getLogger("nvda.simpleCopy.reviewCursor")
 
-class ReviewCursorHandler:
-	def __init__(self):
-		self.logger = logging.getLogger("nvda.simpleCopy.reviewCursor")
+# Paragraphs fetched per TextInfo call when copying in chunks.
+CHUNK_PARAGRAPHS = 50
+# Time spent extracting before giving NVDA back control, and the pause before continuing.
+SLICE_SECONDS = 0.03
+SLICE_PAUSE_MS = 10
+PROGRESS_TONE_INTERVAL = 1.0
+PROGRESS_TONE_HZ = 660
+DOCUMENT_CACHE_ENTRIES = 4
+DOCUMENT_CACHE_MAX_CHARS = 16 * 1024 * 1024
+# Live regions and other DOM changes inside a browse mode document reach no event a global
+# plugin sees, so cached text is only trusted for this long after it was extracted.
+DOCUMENT_CACHE_SECONDS = 10.0
+# Only whole-document copies are cached; a selection is cheap to fetch again.
+CACHEABLE_METHODS = ("UNIT_STORY", "POSITION_ALL")
 
-	def copy_from_review_cursor(self):
-		"""
-		Enhanced Review Cursor Copy logic.
-		Prioritizes copying only the selected text (POSITION_SELECTION).
-		If no selection exists, falls back to copying all text (POSITION_ALL).
-		"""
+
+def get_document_key(obj):
+	"""Identifies the document obj belongs to: its tree interceptor, or else obj itself
+	within its window.
+
+	Returns (key, owner); owner is the tree interceptor or obj, which has to still
+	be alive for a cached entry to be used. A window can hold several objects
+	with their own text, so window keys include the object's identity as well.
+	"""
+	if obj is None:
+		return None, None
+	# A browse mode TextInfo's obj is the tree interceptor itself.
+	tree_interceptor = obj if hasattr(obj, 'rootNVDAObject') else getattr(obj, 'treeInterceptor', None)
+	if tree_interceptor is not None:
+		return ("treeInterceptor", id(tree_interceptor)), tree_interceptor
+	window_handle = getattr(obj, 'windowHandle', None)
+	if window_handle:
+		return ("window", window_handle, id(obj)), obj
+	return None, None
+
+
+class DocumentTextCache:
+	"""Least recently used cache of whole-document text, dropped when the document changes.
+
+	Entries also expire max_age seconds after they were stored, since not every
+	change to a document is reported.
+	"""
+
+	def __init__(self, max_entries=DOCUMENT_CACHE_ENTRIES, max_chars=DOCUMENT_CACHE_MAX_CHARS, max_age=DOCUMENT_CACHE_SECONDS):
+		self.max_entries = max_entries
+		self.max_chars = max_chars
+		self.max_age = max_age
+		self._entries = OrderedDict()
+		self._total_chars = 0
+		# Bumped on every invalidation, so text extracted while the document changed is not stored.
+		self.generation = 0
+
+	def get(self, key, owner):
+		entry = self._entries.get(key)
+		if entry is None:
+			return None
+		owner_ref, text, expires = entry
+		if owner_ref() is not owner or time.monotonic() >= expires:
+			self._pop(key)
+			return None
+		self._entries.move_to_end(key)
+		return text
+
+	def put(self, key, owner, text, generation):
+		if generation != self.generation or not text or len(text) > self.max_chars:
+			return
 		try:
-			review_pos = api.getReviewPosition()
-			if not review_pos:
-				self.logger.debug("No review position available")
-				return None
-
-			focus_obj = api.getFocusObject()
-			selected_text = self._get_selected_text(focus_obj)
-			if selected_text:
-				self.logger.info(f"Copied selected text only: {len(selected_text)} chars")
-				return selected_text
-
-			self.logger.debug("No selection found, falling back to copying all text.")
-			all_text = self._get_all_text(review_pos)
-			if all_text:
-				self.logger.info(f"Copied all text from review context: {len(all_text)} chars")
-				return all_text
+			owner_ref = weakref.ref(owner)
+		except TypeError:
+			return
+		self._pop(key)
+		self._entries[key] = (owner_ref, text, time.monotonic() + self.max_age)
+		self._total_chars += len(text)
+		while len(self._entries) > self.max_entries or self._total_chars > self.max_chars:
+			self._pop(next(iter(self._entries)))
 
-			self.logger.warning("No text found at review cursor")
+	def invalidate(self, obj):
+		self.generation += 1
+		if not self._entries:
+			return
+		key = get_document_key(obj)[0]
+		if key is not None:
+			self._pop(key)
+		# A change anywhere in a window may alter the text of any object cached for it.
+		window_handle = getattr(obj, 'windowHandle', None)
+		if window_handle:
+			for cached_key in [k for k in self._entries if k[0] == "window" and k[1] == window_handle]:
+				self._pop(cached_key)
+
+	def clear(self):
+		self._entries.clear()
+		self._total_chars = 0
+		self.generation += 1
+
+	def _pop(self, key):
+		entry = self._entries.pop(key, None)
+		if entry is not None:
+			self._total_chars -= len(entry[1])
+
+
+class ReviewCopyJob:
+	"""Copies the text of a TextInfo range a few paragraphs at a time.
+
+	TextInfo objects may only be used on NVDA's main thread, so rather than
+	moving the work to another thread the job runs in short slices scheduled
+	with core.callLater. Key presses are handled between slices, which keeps
+	NVDA responsive and lets the user cancel. callback receives the joined
+	text, or None if nothing was found; it is not called after cancel(). If
+	extraction fails partway, the partial text is discarded and callback
+	receives None with failed=True.
+	"""
+
+	def __init__(self, text_range, method_name, callback):
+		self.logger = logging.getLogger("nvda.simpleCopy.reviewCursor")
+		self.method_name = method_name
+		self.callback = callback
+		self.cancelled = False
+		self.finished = False
+		self._range = text_range
+		self._reader = text_range.copy()
+		self._reader.collapse()
+		self._normalizer = TextNormalizer(strip_unprintable=False)
+		self._chunks = []
+		self._next_tone = None
+
+	def start(self):
+		self._next_tone = time.perf_counter() + PROGRESS_TONE_INTERVAL
+		self._run_slice()
+
+	def cancel(self):
+		if self.finished:
+			return False
+		self.cancelled = True
+		self.finished = True
+		self.logger.info(f"Review copy cancelled after {len(self._chunks)} chunks")
+		return True
+
+	def _next_chunk(self):
+		chunk = self._reader.copy()
+		if not chunk.move(textInfos.UNIT_PARAGRAPH, CHUNK_PARAGRAPHS, endPoint="end"):
 			return None
+		if chunk.compareEndPoints(self._range, "endToEnd") > 0:
+			chunk.setEndPoint(self._range, "endToEnd")
+		self._reader = chunk.copy()
+		self._reader.collapse(end=True)
+		return chunk.clipboardText if hasattr(chunk, 'clipboardText') else chunk.text
 
+	def _run_slice(self):
+		if self.cancelled:
+			return
+		deadline = time.perf_counter() + SLICE_SECONDS
+		try:
+			while True:
+				chunk_text = self._next_chunk()
+				if chunk_text is None or self._reader.compareEndPoints(self._range, "startToEnd") >= 0:
+					if chunk_text:
+						self._chunks.append(self._normalizer.feed(chunk_text))
+					self._finish()
+					return
+				self._chunks.append(self._normalizer.feed(chunk_text))
+				if time.perf_counter() >= deadline:
+					break
+		except (RuntimeError, NotImplementedError) as e:
+			# Some TextInfo implementations cannot move by paragraph; fetch the range whole instead.
+			self.logger.debug(f"Chunked extraction failed using {self.method_name}, copying whole range: {e}")
+			self._copy_whole_range()
+			return
 		except Exception as e:
-			self.logger.error(f"Error copying from review cursor: {e}", exc_info=True)
-			return None
+			self.logger.error(f"Text extraction failed using {self.method_name}: {e}")
+			self._fail()
+			return
+		now = time.perf_counter()
+		if now >= self._next_tone:
+			tones.beep(PROGRESS_TONE_HZ, 40)
+			self._next_tone = now + PROGRESS_TONE_INTERVAL
+		core.callLater(SLICE_PAUSE_MS, self._run_slice)
 
-	def _get_selected_text(self, focus_obj):
-		"""
-		Attempts to retrieve only the currently selected text chunk.
-		Uses the textInfos.POSITION_SELECTION constant which respects NVDA's virtual buffer.
-		"""
-		if not focus_obj:
-			return None
+	def _copy_whole_range(self):
+		self._chunks = []
+		self._normalizer = TextNormalizer(strip_unprintable=False)
 		try:
-			tree_interceptor = getattr(focus_obj, 'treeInterceptor', None)
-			info_source = tree_interceptor if tree_interceptor else focus_obj
+			raw_text = self._range.clipboardText if hasattr(self._range, 'clipboardText') else self._range.text
+			if raw_text:
+				self._chunks.append(self._normalizer.feed(raw_text))
+		except Exception as e:
+			self.logger.error(f"Text extraction failed using {self.method_name}: {e}")
+			self._fail()
+			return
+		self._finish()
 
-			if hasattr(info_source, 'makeTextInfo'):
-				info = info_source.makeTextInfo(textInfos.POSITION_SELECTION)
-				if info and not info.isCollapsed:
-					return self._extract_text(info, "POSITION_SELECTION")
-		except (RuntimeError, NotImplementedError) as e:
-			self.logger.debug(f"POSITION_SELECTION not supported or failed: {e}")
-		return None
+	def _finish(self):
+		if self.finished:
+			return
+		self.finished = True
+		self._chunks.append(self._normalizer.finish())
+		text = "".join(self._chunks).strip()
+		self._chunks = []
+		self.logger.info(f"Review copy using {self.method_name}: {len(text)} chars")
+		self.callback(text or None)
 
-	def _get_all_text(self, review_pos):
-		"""
-		Fallback method to copy all visible text in the review context.
+	def _fail(self):
+		if self.finished:
+			return
+		self.finished = True
+		# Text gathered before the failure is incomplete, so it is neither copied nor cached.
+		self._chunks = []
+		self.callback(None, failed=True)
+
+class ReviewCursorHandler:
+	def __init__(self):
+		self.logger = logging.getLogger("nvda.simpleCopy.reviewCursor")
+		self._job = None
+		self.document_cache = DocumentTextCache()
+
+	def copy_from_review_cursor_async(self, callback):
+		"""Starts copying the selection, or the whole review context, in chunks.
+
+		Small texts finish before this returns. Returns False if there was
+		nothing to copy from, in which case callback is not called.
 		"""
+		self.cancel()
+		try:
+			text_range, method_name = self._get_copy_range()
+		except Exception as e:
+			self.logger.error(f"Error copying from review cursor: {e}", exc_info=True)
+			return False
+		if text_range is None:
+			self.logger.warning("No text found at review cursor")
+			return False
+		if method_name in CACHEABLE_METHODS:
+			key, owner = get_document_key(getattr(text_range, 'obj', None))
+			if key is not None:
+				text = self.document_cache.get(key, owner)
+				if text is not None:
+					self.logger.info(f"Review copy served from cache: {len(text)} chars")
+					callback(text)
+					return True
+				callback = self._caching_callback(callback, key, owner)
+		self._job = ReviewCopyJob(text_range, method_name, callback)
+		self._job.start()
+		return True
+
+	def _caching_callback(self, callback, key, owner):
+		generation = self.document_cache.generation
+
+		def _store_and_deliver(text, failed=False):
+			if failed:
+				callback(text, failed=True)
+				return
+			self.document_cache.put(key, owner, text, generation)
+			callback(text)
+		return _store_and_deliver
+
+	def invalidate(self, obj):
+		"""Forgets cached text of the document obj belongs to; called on document change events."""
+		self.document_cache.invalidate(obj)
+
+	def cancel(self):
+		"""Cancels a copy in progress; returns whether there was one."""
+		job = self._job
+		self._job = None
+		return bool(job and job.cancel())
+
+	def is_copying(self):
+		return bool(self._job and not self._job.finished)
+
+	def _get_copy_range(self):
+		review_pos = api.getReviewPosition()
+		if not review_pos:
+			self.logger.debug("No review position available")
+			return None, None
+
+		focus_obj = api.getFocusObject()
+		selection = self._get_selection_range(focus_obj)
+		if selection is not None:
+			return selection, "POSITION_SELECTION"
+
+		self.logger.debug("No selection found, falling back to copying all text.")
 		try:
 			info = review_pos.copy()
 			info.expand(textInfos.UNIT_STORY)
-			return self._extract_text(info, "UNIT_STORY")
+			return info, "UNIT_STORY"
 		except Exception as e:
 			self.logger.debug(f"Could not expand to UNIT_STORY: {e}")
 
 		try:
-			focus_obj = api.getFocusObject()
 			if hasattr(focus_obj, 'makeTextInfo'):
-				info = focus_obj.makeTextInfo(textInfos.POSITION_ALL)
-				return self._extract_text(info, "POSITION_ALL")
+				return focus_obj.makeTextInfo(textInfos.POSITION_ALL), "POSITION_ALL"
 		except Exception as e:
 			self.logger.debug(f"POSITION_ALL fallback failed: {e}")
+		return None, None
 
-		return None
-
-	def _extract_text(self, text_info, method_name):
-		"""
-		Safely extracts and cleans text from a TextInfo object.
-		Uses clipboardText first to preserve formatting like newlines accurately.
-		"""
-		if not text_info:
+	def _get_selection_range(self, focus_obj):
+		if not focus_obj:
 			return None
 		try:
-			raw_text = text_info.clipboardText if hasattr(text_info, 'clipboardText') else text_info.text
-			if raw_text:
-				return raw_text.replace('\r\n', '\n').replace('\r', '\n').strip()
-		except Exception as e:
-			self.logger.error(f"Text extraction failed using {method_name}: {e}")
-		return None
\ No newline at end of file
+			tree_interceptor = getattr(focus_obj, 'treeInterceptor', None)
+			info_source = tree_interceptor if tree_interceptor else focus_obj
+
+			if hasattr(info_source, 'makeTextInfo'):
+				info = info_source.makeTextInfo(textInfos.POSITION_SELECTION)
+				if info and not info.isCollapsed:
+					return info
+		except (RuntimeError, NotImplementedError) as e:
+			self.logger.debug(f"POSITION_SELECTION not supported or failed: {e}")
+		return None
@@ -0,0 +1,112 @@
+# settings.py
+
+import addonHandler
+addonHandler.initTranslation()
+
+import config
+import extensionPoints
+import wx
+from gui import guiHelper
+from gui.settingsDialogs import SettingsPanel
+
+CONF_SECTION = "simpleCopy"
+
+confspec = {
+	"adaptiveTapTiming": "boolean(default=True)",
+	"speechHistoryBudgetKB": "integer(default=1024, min=64, max=65536)",
+	"persistSpeechHistory": "boolean(default=False)",
+	"speechArchiveDays": "integer(default=14, min=1, max=365)",
+	"dedupAppends": "boolean(default=False)",
+	"clipboardHistory": "boolean(default=False)",
+	"clipboardHistoryBudgetKB": "integer(default=2048, min=64, max=65536)",
+	"browserApps": "string(default='chrome,firefox,edge,msedge,opera,safari,brave,vivaldi,thorium,chromium')",
+}
+
+# Notified after the settings panel saves, so the plugin can apply changes without a restart.
+post_settingsSave = extensionPoints.Action()
+
+
+def initialize():
+	config.conf.spec[CONF_SECTION] = confspec
+
+
+def get(key):
+	return config.conf[CONF_SECTION][key]
+
+
+class SimpleCopySettingsPanel(SettingsPanel):
+	# Translators: Title of the simpleCopy settings panel.
+	title = _("Simple Copy")
+
+	def makeSettings(self, settingsSizer):
+		helper = guiHelper.BoxSizerHelper(self, sizer=settingsSizer)
+
+		self.adaptiveTapTimingCheckBox = helper.addItem(
+			# Translators: Checkbox in the simpleCopy settings panel.
+			wx.CheckBox(self, label=_("Learn multi-tap delay from my tapping speed"))
+		)
+		self.adaptiveTapTimingCheckBox.SetValue(get("adaptiveTapTiming"))
+
+		self.speechHistoryBudgetSpin = helper.addLabeledControl(
+			# Translators: Spin control in the simpleCopy settings panel.
+			_("Memory for speech history (KB):"),
+			wx.SpinCtrl,
+			min=64,
+			max=65536,
+			initial=get("speechHistoryBudgetKB")
+		)
+
+		self.persistSpeechHistoryCheckBox = helper.addItem(
+			# Translators: Checkbox in the simpleCopy settings panel.
+			wx.CheckBox(self, label=_("Keep speech history across NVDA restarts"))
+		)
+		self.persistSpeechHistoryCheckBox.SetValue(get("persistSpeechHistory"))
+
+		self.speechArchiveDaysSpin = helper.addLabeledControl(
+			# Translators: Spin control in the simpleCopy settings panel.
+			_("Days of speech history to keep:"),
+			wx.SpinCtrl,
+			min=1,
+			max=365,
+			initial=get("speechArchiveDays")
+		)
+
+		self.dedupAppendsCheckBox = helper.addItem(
+			# Translators: Checkbox in the simpleCopy settings panel.
+			wx.CheckBox(self, label=_("Do not append the same text twice"))
+		)
+		self.dedupAppendsCheckBox.SetValue(get("dedupAppends"))
+
+		self.clipboardHistoryCheckBox = helper.addItem(
+			# Translators: Checkbox in the simpleCopy settings panel.
+			wx.CheckBox(self, label=_("Keep a history of copied text"))
+		)
+		self.clipboardHistoryCheckBox.SetValue(get("clipboardHistory"))
+
+		self.clipboardHistoryBudgetSpin = helper.addLabeledControl(
+			# Translators: Spin control in the simpleCopy settings panel.
+			_("Memory for clipboard history (KB):"),
+			wx.SpinCtrl,
+			min=64,
+			max=65536,
+			initial=get("clipboardHistoryBudgetKB")
+		)
+
+		self.browserAppsEdit = helper.addLabeledControl(
+			# Translators: Edit field in the simpleCopy settings panel, listing browser program names such as chrome.
+			_("Browser process names, separated by commas:"),
+			wx.TextCtrl
+		)
+		self.browserAppsEdit.SetValue(get("browserApps"))
+
+	def onSave(self):
+		conf = config.conf[CONF_SECTION]
+		conf["adaptiveTapTiming"] = self.adaptiveTapTimingCheckBox.GetValue()
+		conf["speechHistoryBudgetKB"] = self.speechHistoryBudgetSpin.GetValue()
+		conf["persistSpeechHistory"] = self.persistSpeechHistoryCheckBox.GetValue()
+		conf["speechArchiveDays"] = self.speechArchiveDaysSpin.GetValue()
+		conf["dedupAppends"] = self.dedupAppendsCheckBox.GetValue()
+		conf["clipboardHistory"] = self.clipboardHistoryCheckBox.GetValue()
+		conf["clipboardHistoryBudgetKB"] = self.clipboardHistoryBudgetSpin.GetValue()
+		conf["browserApps"] = self.browserAppsEdit.GetValue()
+		post_settingsSave.notify()
@@ -0,0 +1,226 @@
+# speech_archive.py
+
+import os
+import json
+import time
+import zlib
+import bisect
+import threading
+import logging
+from collections import OrderedDict
+
+log = logging.getLogger("nvda.simpleCopy.speechArchive")
+
+ARCHIVE_SEGMENT_ENTRIES = 1000
+ARCHIVE_CACHED_SEGMENTS = 4
+INDEX_FILE_NAME = "index.json"
+
+
+class SpeechArchive:
+	"""Keeps speech history across sessions in time-ordered, zlib-compressed segments.
+
+	New entries collect in an open segment that is sealed to disk once it holds
+	segment_entries items, or when the archive is closed. index.json records the
+	id, time span and entry count of every sealed segment, so an entry can be
+	located by position and only the segment containing it is read.
+	Positions passed to the read methods count from the newest entry, like the
+	in-memory history deque.
+	"""
+
+	def __init__(
+		self,
+		directory,
+		retention_days,
+		segment_entries=ARCHIVE_SEGMENT_ENTRIES,
+		cached_segments=ARCHIVE_CACHED_SEGMENTS
+	):
+		self.directory = directory
+		self.retention_days = retention_days
+		self.segment_entries = segment_entries
+		self.cached_segments = cached_segments
+		self.index_path = os.path.join(directory, INDEX_FILE_NAME)
+		self._lock = threading.RLock()
+		self._segments = []
+		self._starts = []
+		self._sealed_count = 0
+		self._active = []
+		self._cache = OrderedDict()
+		if not os.path.exists(directory):
+			os.makedirs(directory)
+		self._load_index()
+		self.prune()
+
+	def _segment_path(self, segment_id):
+		return os.path.join(self.directory, f"segment_{segment_id:08d}.z")
+
+	def _load_index(self):
+		try:
+			with open(self.index_path, "r", encoding="utf-8") as f:
+				loaded = json.load(f)
+			segments = [
+				(int(seg[0]), float(seg[1]), float(seg[2]), int(seg[3]))
+				for seg in loaded.get("segments", [])
+			]
+		except FileNotFoundError:
+			segments = self._rebuild_index()
+		except (OSError, ValueError, TypeError, IndexError, AttributeError) as e:
+			log.error(f"Speech archive index unreadable, rebuilding: {e}")
+			segments = self._rebuild_index()
+		self._set_segments([seg for seg in segments if os.path.exists(self._segment_path(seg[0]))])
+
+	def _rebuild_index(self):
+		segments = []
+		for name in sorted(os.listdir(self.directory)):
+			if not (name.startswith("segment_") and name.endswith(".z")):
+				continue
+			try:
+				segment_id = int(name[len("segment_"):-len(".z")])
+				entries = self._read_segment(segment_id)
+			except (OSError, ValueError, zlib.error) as e:
+				log.error(f"Skipping damaged speech archive segment {name}: {e}")
+				continue
+			if entries:
+				segments.append((segment_id, entries[0][0], entries[-1][0], len(entries)))
+		if segments:
+			self._write_index(segments)
+		return segments
+
+	def _set_segments(self, segments):
+		self._segments = segments
+		self._starts = []
+		total = 0
+		for seg in segments:
+			self._starts.append(total)
+			total += seg[3]
+		self._sealed_count = total
+
+	def _write_index(self, segments):
+		temp_path = f"{self.index_path}.tmp"
+		with open(temp_path, "w", encoding="utf-8") as f:
+			json.dump({"segments": [list(seg) for seg in segments]}, f)
+		os.replace(temp_path, self.index_path)
+
+	def _read_segment(self, segment_id):
+		with open(self._segment_path(segment_id), "rb") as f:
+			payload = zlib.decompress(f.read())
+		return [tuple(entry) for entry in json.loads(payload.decode("utf-8"))]
+
+	def _get_segment(self, segment_id):
+		entries = self._cache.get(segment_id)
+		if entries is not None:
+			self._cache.move_to_end(segment_id)
+			return entries
+		entries = self._read_segment(segment_id)
+		self._cache[segment_id] = entries
+		while len(self._cache) > self.cached_segments:
+			self._cache.popitem(last=False)
+		return entries
+
+	def append(self, text, timestamp, replaces_last=False):
+		with self._lock:
+			if replaces_last and self._active:
+				self._active[-1] = (timestamp, text)
+				return
+			# Sealing happens before the next new entry, never after, so a state echo can
+			# always replace the entry it follows.
+			if len(self._active) >= self.segment_entries:
+				self.seal()
+			self._active.append((timestamp, text))
+
+	def seal(self):
+		"""Writes the open segment to disk and starts a new one."""
+		with self._lock:
+			if not self._active:
+				return
+			entries = self._active
+			segment_id = self._segments[-1][0] + 1 if self._segments else 1
+			payload = zlib.compress(json.dumps(entries, ensure_ascii=False).encode("utf-8"))
+			try:
+				temp_path = f"{self._segment_path(segment_id)}.tmp"
+				with open(temp_path, "wb") as f:
+					f.write(payload)
+				os.replace(temp_path, self._segment_path(segment_id))
+				segments = self._segments + [(segment_id, entries[0][0], entries[-1][0], len(entries))]
+				self._write_index(segments)
+			except OSError as e:
+				log.error(f"Failed to write speech archive segment: {e}")
+				return
+			self._set_segments(segments)
+			self._active = []
+
+	def prune(self):
+		"""Deletes sealed segments whose newest entry is older than the retention period."""
+		with self._lock:
+			cutoff = time.time() - self.retention_days * 86400
+			expired = [seg for seg in self._segments if seg[2] < cutoff]
+			if not expired:
+				return
+			kept = [seg for seg in self._segments if seg[2] >= cutoff]
+			try:
+				self._write_index(kept)
+			except OSError as e:
+				log.error(f"Failed to update speech archive index: {e}")
+				return
+			for seg in expired:
+				self._cache.pop(seg[0], None)
+				try:
+					os.remove(self._segment_path(seg[0]))
+				except OSError as e:
+					log.warning(f"Could not delete speech archive segment {seg[0]}: {e}")
+			self._set_segments(kept)
+
+	def set_retention_days(self, days):
+		self.retention_days = days
+		self.prune()
+
+	def __len__(self):
+		return self._sealed_count + len(self._active)
+
+	def get(self, position):
+		"""Returns the (timestamp, text) entry at position, counted from the newest."""
+		entries = self.read_range(position, 1)
+		if not entries:
+			raise IndexError("speech archive position out of range")
+		return entries[0]
+
+	def read_range(self, start, count):
+		"""Returns up to count entries starting at position start, newest first.
+
+		Only the segments covering the requested range are loaded.
+		"""
+		with self._lock:
+			result = []
+			position = start
+			end = min(start + count, len(self))
+			active_count = len(self._active)
+			while position < end and position < active_count:
+				result.append(self._active[active_count - 1 - position])
+				position += 1
+			while position < end:
+				chronological = self._sealed_count - 1 - (position - active_count)
+				segment_index = bisect.bisect_right(self._starts, chronological) - 1
+				seg = self._segments[segment_index]
+				try:
+					entries = self._get_segment(seg[0])
+				except (OSError, ValueError, zlib.error) as e:
+					log.error(f"Failed to read speech archive segment {seg[0]}: {e}")
+					break
+				offset = chronological - self._starts[segment_index]
+				while offset >= 0 and position < end:
+					result.append(entries[offset])
+					offset -= 1
+					position += 1
+			return result
+
+	def read_chronological(self, first, count):
+		"""Returns up to count entries starting at chronological index first, oldest first."""
+		with self._lock:
+			end = min(first + count, len(self))
+			if end <= first:
+				return []
+			entries = self.read_range(len(self) - end, end - first)
+			entries.reverse()
+			return entries
+
+	def close(self):
+		self.seal()
@@ -0,0 +1,155 @@
+# speech_log.py
+
+import os
+import threading
+import logging
+
+log = logging.getLogger("nvda.simpleCopy.speechLog")
+
+SPEECH_LOG_FLUSH_INTERVAL = 1.0
+SPEECH_LOG_FLUSH_BYTES = 64 * 1024
+SPEECH_LOG_MAX_BYTES = 1024 * 1024
+SPEECH_LOG_BACKUPS = 3
+
+
+class SpeechLogWriter:
+	"""Appends captured speech to a text file from a background thread.
+
+	Lines are buffered in memory and written in batches, either every
+	flush_interval seconds or as soon as flush_bytes are pending. rotate() keeps
+	earlier sessions as name.1.txt, name.2.txt and so on. When the file would
+	grow past max_bytes during a session, its older half moves to
+	name.part1.txt, then name.part2.txt and so on, and the recent half stays in
+	the file. A session's parts move with it, so name.1.part1.txt belongs to
+	name.1.txt, and one session's parts never push out another's.
+	"""
+	def __init__(
+		self,
+		path,
+		flush_interval=SPEECH_LOG_FLUSH_INTERVAL,
+		flush_bytes=SPEECH_LOG_FLUSH_BYTES,
+		max_bytes=SPEECH_LOG_MAX_BYTES,
+		backups=SPEECH_LOG_BACKUPS
+	):
+		self.path = path
+		self.flush_interval = flush_interval
+		self.flush_bytes = flush_bytes
+		self.max_bytes = max_bytes
+		self.backups = backups
+		self._pending = []
+		self._pending_bytes = 0
+		self._lock = threading.Lock()
+		self._file_lock = threading.Lock()
+		self._wake_event = threading.Event()
+		self._running = True
+		self._file_size = self._get_file_size()
+		self._thread = threading.Thread(target=self._run, name="simpleCopy.speechLog", daemon=True)
+		self._thread.start()
+
+	def _get_file_size(self):
+		try:
+			return os.path.getsize(self.path)
+		except OSError:
+			return 0
+
+	def _backup_path(self, session=0, part=0):
+		"""The file holding the given part of a session's log; session 0 is the current one."""
+		base, ext = os.path.splitext(self.path)
+		if session:
+			base = f"{base}.{session}"
+		if part:
+			base = f"{base}.part{part}"
+		return f"{base}{ext}"
+
+	def _session_paths(self, session):
+		return [self._backup_path(session, part) for part in range(self.backups + 1)]
+
+	def rotate(self):
+		"""Moves the current log aside as the previous session's, so the next write starts a new file."""
+		with self._file_lock:
+			self._rotate()
+
+	def _rotate(self):
+		if self._file_size == 0 and not os.path.exists(self._backup_path(0, 1)):
+			return
+		try:
+			for path in self._session_paths(self.backups):
+				if os.path.exists(path):
+					os.remove(path)
+			for session in range(self.backups - 1, -1, -1):
+				for source, target in zip(self._session_paths(session), self._session_paths(session + 1)):
+					if os.path.exists(source):
+						os.replace(source, target)
+			self._file_size = 0
+		except OSError as e:
+			log.error(f"Speech log rotation failed: {e}")
+
+	def _rotate_part(self):
+		"""Moves the older half of the current log to a part file, keeping the recent half."""
+		try:
+			with open(self.path, "rb") as f:
+				data = f.read()
+			middle = data.find(b"\n", len(data) // 2) + 1 or len(data)
+			if self.backups > 0:
+				oldest = self._backup_path(0, self.backups)
+				if os.path.exists(oldest):
+					os.remove(oldest)
+				for part in range(self.backups - 1, 0, -1):
+					source = self._backup_path(0, part)
+					if os.path.exists(source):
+						os.replace(source, self._backup_path(0, part + 1))
+				with open(self._backup_path(0, 1), "wb") as f:
+					f.write(data[:middle])
+			temp_path = f"{self.path}.tmp"
+			with open(temp_path, "wb") as f:
+				f.write(data[middle:])
+			os.replace(temp_path, self.path)
+			self._file_size = len(data) - middle
+		except OSError as e:
+			log.error(f"Speech log rotation failed: {e}")
+
+	def write(self, text, replaces_last=False):
+		"""Queues one line. With replaces_last, an unflushed previous line is overwritten."""
+		data = (text + "\n").encode("utf-8")
+		with self._lock:
+			if replaces_last and self._pending:
+				self._pending_bytes -= len(self._pending[-1])
+				self._pending[-1] = data
+			else:
+				self._pending.append(data)
+			self._pending_bytes += len(data)
+			should_wake = self._pending_bytes >= self.flush_bytes
+		if should_wake:
+			self._wake_event.set()
+
+	def flush(self):
+		# The file lock is held from taking the batch until it is written, so batches
+		# reach the file in the order they were queued. write() only needs _lock.
+		with self._file_lock:
+			with self._lock:
+				if not self._pending:
+					return
+				chunks = self._pending
+				self._pending = []
+				self._pending_bytes = 0
+			data = b"".join(chunks)
+			if self._file_size + len(data) > self.max_bytes:
+				self._rotate_part()
+			try:
+				with open(self.path, "ab") as f:
+					f.write(data)
+				self._file_size += len(data)
+			except OSError as e:
+				log.error(f"Speech log write failed: {e}")
+
+	def _run(self):
+		while self._running:
+			self._wake_event.wait(self.flush_interval)
+			self._wake_event.clear()
+			self.flush()
+
+	def close(self):
+		self._running = False
+		self._wake_event.set()
+		self._thread.join(timeout=1.0)
+		self.flush()
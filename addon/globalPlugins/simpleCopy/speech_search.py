@@ -0,0 +1,237 @@
+# speech_search.py
+
+import re
+import threading
+import logging
+from array import array
+from bisect import bisect_left
+import addonHandler
+import wx
+import core
+import speech
+
+addonHandler.initTranslation()
+log = logging.getLogger("nvda.simpleCopy.speechSearch")
+
+SEARCH_RESULT_LIMIT = 200
+BACKFILL_CHUNK_ENTRIES = 2000
+# Without an archive, entries that have left the history are purged this often.
+PURGE_INTERVAL = 4096
+
+_word_re = re.compile(r"\w+")
+
+
+def tokenize(text):
+	return set(_word_re.findall(text.lower()))
+
+
+class SpeechSearchIndex:
+	"""Inverted word index over speech history, updated as utterances are recorded.
+
+	Every recorded utterance gets an increasing id and each word maps to a
+	sorted array of the ids containing it. Position in the newest-first history
+	view is next_id - 1 - id, so hits can be handed straight to the navigator.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._postings = {}
+		self._next_id = 0
+		self._last_tokens = ()
+		self._floor = 0
+		self._adds_since_purge = 0
+		self._backfill_thread = None
+		self._generation = 0
+
+	def _add_tokens(self, tokens, entry_id):
+		postings = self._postings
+		for token in tokens:
+			ids = postings.get(token)
+			if ids is None:
+				ids = postings[token] = array("I")
+			ids.append(entry_id)
+
+	def add(self, text):
+		tokens = tokenize(text)
+		with self._lock:
+			self._add_tokens(tokens, self._next_id)
+			self._next_id += 1
+			self._last_tokens = tokens
+			self._adds_since_purge += 1
+
+	def replace_last(self, text):
+		"""Reindexes the newest entry after a state echo replaced its text."""
+		tokens = tokenize(text)
+		with self._lock:
+			if not self._next_id:
+				return
+			entry_id = self._next_id - 1
+			for token in self._last_tokens:
+				ids = self._postings.get(token)
+				if ids and ids[-1] == entry_id:
+					ids.pop()
+					if not ids:
+						del self._postings[token]
+			self._add_tokens(tokens, entry_id)
+			self._last_tokens = tokens
+
+	def purge(self, history_length):
+		"""Drops ids that have scrolled out of a history of history_length entries."""
+		with self._lock:
+			if self._adds_since_purge < PURGE_INTERVAL:
+				return
+			self._adds_since_purge = 0
+			floor = self._next_id - history_length
+			if floor <= self._floor:
+				return
+			self._floor = floor
+			for token in list(self._postings):
+				ids = self._postings[token]
+				cut = bisect_left(ids, floor)
+				if cut == len(ids):
+					del self._postings[token]
+				elif cut:
+					del ids[:cut]
+
+	def rebuild_from_archive(self, archive):
+		"""Restarts ids at the archive length and indexes older entries in the background."""
+		with self._lock:
+			self._generation += 1
+			generation = self._generation
+			base = len(archive)
+			self._postings = {}
+			self._next_id = base
+			self._last_tokens = ()
+			self._floor = 0
+			self._adds_since_purge = 0
+		self._backfill_thread = threading.Thread(
+			target=self._backfill,
+			args=(archive, base, generation),
+			name="simpleCopy.speechSearchBackfill",
+			daemon=True
+		)
+		self._backfill_thread.start()
+
+	def _backfill(self, archive, base, generation):
+		backfill = {}
+		try:
+			for first in range(0, base, BACKFILL_CHUNK_ENTRIES):
+				if generation != self._generation:
+					return
+				for offset, entry in enumerate(archive.read_chronological(first, BACKFILL_CHUNK_ENTRIES)):
+					entry_id = first + offset
+					for token in tokenize(entry[1]):
+						ids = backfill.get(token)
+						if ids is None:
+							ids = backfill[token] = array("I")
+						ids.append(entry_id)
+		except Exception as e:
+			log.error(f"Speech search backfill failed: {e}")
+			return
+		with self._lock:
+			if generation != self._generation:
+				return
+			for token, older in backfill.items():
+				newer = self._postings.get(token)
+				if newer is not None:
+					older.extend(newer)
+				self._postings[token] = older
+		log.info(f"Speech search index built over {base} archived entries")
+
+	def search(self, query, history_length, limit=SEARCH_RESULT_LIMIT):
+		"""Returns newest-first view positions of entries containing every word in query."""
+		tokens = tokenize(query)
+		if not tokens:
+			return []
+		with self._lock:
+			lists = []
+			for token in tokens:
+				ids = self._postings.get(token)
+				if not ids:
+					return []
+				lists.append(ids)
+			lists.sort(key=len)
+			smallest, others = lists[0], lists[1:]
+			newest_id = self._next_id - 1
+			positions = []
+			for i in range(len(smallest) - 1, -1, -1):
+				entry_id = smallest[i]
+				position = newest_id - entry_id
+				if position >= history_length:
+					break
+				if all(self._contains(ids, entry_id) for ids in others):
+					positions.append(position)
+					if len(positions) >= limit:
+						break
+			return positions
+
+	@staticmethod
+	def _contains(ids, entry_id):
+		i = bisect_left(ids, entry_id)
+		return i < len(ids) and ids[i] == entry_id
+
+
+class SpeechSearchDialog(wx.Dialog):
+	def __init__(self, parent, speech_history):
+		super().__init__(parent, title=_("Search Speech History"), size=(600, 400),
+						 style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER | wx.STAY_ON_TOP)
+		self.speech_history = speech_history
+		self._positions = []
+		self._initUi()
+		self.Centre()
+		self.Bind(wx.EVT_CLOSE, self._onClose)
+		self.Bind(wx.EVT_CHAR_HOOK, self._onChar)
+
+	def _initUi(self):
+		panel = wx.Panel(self)
+		sizer = wx.BoxSizer(wx.VERTICAL)
+
+		queryLabel = wx.StaticText(panel, label=_("Search for:"))
+		sizer.Add(queryLabel, 0, wx.ALL | wx.ALIGN_LEFT, 5)
+		self.queryCtrl = wx.TextCtrl(panel)
+		sizer.Add(self.queryCtrl, 0, wx.EXPAND | wx.ALL, 5)
+
+		self.listCtrl = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL | wx.LC_NO_HEADER)
+		self.listCtrl.InsertColumn(0, _("Speech"), width=550)
+		sizer.Add(self.listCtrl, 1, wx.EXPAND | wx.ALL, 5)
+
+		panel.SetSizer(sizer)
+
+		self.queryCtrl.Bind(wx.EVT_TEXT, self._onQueryChanged)
+		self.listCtrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self._onActivate)
+
+	def _onQueryChanged(self, event):
+		self._positions = self.speech_history.search(self.queryCtrl.GetValue())
+		self.listCtrl.DeleteAllItems()
+		for position in self._positions:
+			entry = self.speech_history.get_entry(position)
+			self.listCtrl.InsertItem(self.listCtrl.GetItemCount(), entry.text if entry else "")
+		if self._positions:
+			self.listCtrl.Select(0)
+			self.listCtrl.Focus(0)
+
+	def _onActivate(self, event):
+		selected = self.listCtrl.GetFirstSelected()
+		if selected == -1 or selected >= len(self._positions):
+			return
+		sequence = self.speech_history.jump_to(self._positions[selected])
+		self.Close()
+		if sequence is not None:
+			core.callLater(50, speech.speak, sequence)
+
+	def _onChar(self, event):
+		key = event.GetKeyCode()
+		if key == wx.WXK_RETURN:
+			if self.FindFocus() is self.queryCtrl:
+				if self._positions:
+					self.listCtrl.SetFocus()
+				return
+			self._onActivate(event)
+			return
+		elif key == wx.WXK_ESCAPE:
+			self.Close()
+		else:
+			event.Skip()
+
+	def _onClose(self, event):
+		self.Destroy()
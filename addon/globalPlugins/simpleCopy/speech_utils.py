@@ -3,14 +3,189 @@
 import speech
 import speechViewer
 import os
+import sys
+import time
+import threading
 import globalVars
 from collections import deque, namedtuple
 import logging
 from eventHandler import FocusLossCancellableSpeechCommand
+from .speech_log import SpeechLogWriter
+from .speech_archive import SpeechArchive
+from .speech_search import SpeechSearchIndex
 
 log = logging.getLogger("nvda.simpleCopy.speech")
 
-SpeechHistoryEntry = namedtuple("SpeechHistoryEntry", ["sequence", "text"])
+class SpeechHistoryEntry(namedtuple("_SpeechHistoryEntry", ["sequence", "timestamp"], defaults=(0.0,))):
+	"""One captured utterance.
+
+	The sequence is stored as a tuple whose strings come from the fragment
+	table, and the text is derived from it on demand instead of being kept as a
+	second copy.
+	"""
+
+	__slots__ = ()
+
+	@property
+	def text(self):
+		sequence = self.sequence
+		if isinstance(sequence, str):
+			return sequence.strip()
+		return speechViewer.SPEECH_ITEM_SEPARATOR.join(
+			[item for item in sequence if isinstance(item, str)]
+		).strip()
+
+
+# Raw utterances waiting for the capture worker. When NVDA speaks faster than
+# the worker drains, the oldest pending utterances are dropped.
+CAPTURE_QUEUE_SIZE = 1000
+
+DEFAULT_HISTORY_BUDGET_BYTES = 1024 * 1024
+# Rough cost of the entry tuple, its timestamp, the sequence tuple and the deque slot.
+ENTRY_OVERHEAD_BYTES = 136
+# Longer fragments are mostly say-all text that never repeats, so they are not interned.
+MAX_INTERNED_FRAGMENT_LENGTH = 200
+MAX_INTERNED_FRAGMENTS = 20000
+# Rough cost of a fragment's slots in the table's two dicts and its reference count.
+FRAGMENT_OVERHEAD_BYTES = 112
+POINTER_BYTES = 8
+
+
+def estimate_entry_size(entry, fragments):
+	"""Estimates the memory an entry holds on its own.
+
+	Fragments interned in the fragments table are shared with other entries and
+	charged to the table, so they only count as a reference here. Any other
+	string is the entry's own.
+	"""
+	size = ENTRY_OVERHEAD_BYTES
+	sequence = entry.sequence
+	if isinstance(sequence, str):
+		return size + sys.getsizeof(sequence)
+	for item in sequence:
+		if isinstance(item, str) and not fragments.owns(item):
+			size += POINTER_BYTES + sys.getsizeof(item)
+		else:
+			size += POINTER_BYTES
+	return size
+
+
+class FragmentTable:
+	"""Stores each short speech fragment once so repeated roles and states are shared.
+
+	Each fragment is reference counted by the history entries that use it, and
+	dropped once the last of them is released, so size_bytes always covers
+	exactly the fragments history still holds. Once max_fragments are stored,
+	new fragments are not interned and stay owned by their entry.
+	"""
+
+	def __init__(self, max_fragments=MAX_INTERNED_FRAGMENTS):
+		self.max_fragments = max_fragments
+		self._fragments = {}
+		self._references = {}
+		self.size_bytes = 0
+
+	def __len__(self):
+		return len(self._fragments)
+
+	def owns(self, fragment):
+		"""Whether fragment is the table's canonical copy, rather than an equal string held elsewhere."""
+		return self._fragments.get(fragment) is fragment
+
+	def intern(self, fragment):
+		if len(fragment) > MAX_INTERNED_FRAGMENT_LENGTH:
+			return fragment
+		fragments = self._fragments
+		canonical = fragments.get(fragment)
+		if canonical is None:
+			if len(fragments) >= self.max_fragments:
+				return fragment
+			fragments[fragment] = canonical = fragment
+			self._references[fragment] = 0
+			self.size_bytes += FRAGMENT_OVERHEAD_BYTES + sys.getsizeof(fragment)
+		self._references[canonical] += 1
+		return canonical
+
+	def intern_sequence(self, sequence):
+		if isinstance(sequence, str):
+			return (self.intern(sequence),)
+		intern = self.intern
+		return tuple(
+			intern(item) if isinstance(item, str) else item
+			for item in sequence
+			if not isinstance(item, FocusLossCancellableSpeechCommand)
+		)
+
+	def release_sequence(self, sequence):
+		"""Drops one reference to each fragment of a sequence returned by intern_sequence."""
+		references = self._references
+		for item in sequence:
+			if isinstance(item, str) and self.owns(item):
+				count = references[item] - 1
+				if count:
+					references[item] = count
+				else:
+					del references[item]
+					del self._fragments[item]
+					self.size_bytes -= FRAGMENT_OVERHEAD_BYTES + sys.getsizeof(item)
+
+
+class EchoDeduplicator:
+	"""Detects state echoes, where an utterance repeats the previous one plus a new
+	state, such as "Remember me check box" followed by "Remember me checked".
+
+	Keeps the token set of the current head utterance, so each new utterance is
+	tokenized once and compared against the cached set.
+	"""
+
+	_CHECKBOX_ROLE = " check box"
+
+	def __init__(self):
+		self._head_tokens = None
+
+	def reset(self, head_text=None):
+		self._head_tokens = self._head_tokens_for(head_text, None) if head_text else None
+
+	def _head_tokens_for(self, text, tokens):
+		if self._CHECKBOX_ROLE in text:
+			return frozenset(text.replace(self._CHECKBOX_ROLE, " ").strip().lower().split())
+		if tokens is None:
+			tokens = frozenset(text.lower().split())
+		return tokens
+
+	def advance(self, current_text):
+		"""Makes current_text the new head and reports whether it echoes the previous head."""
+		if not current_text:
+			return False
+		current_tokens = frozenset(current_text.lower().split())
+		previous_tokens = self._head_tokens
+		self._head_tokens = self._head_tokens_for(current_text, current_tokens)
+		return bool(previous_tokens) and previous_tokens.issubset(current_tokens)
+
+
+class SpeechHistoryView:
+	"""Newest-first view over the in-memory history, continued by the archive.
+
+	The archive receives exactly the same appends and echo replacements as the
+	deque, so position i means the same utterance in both. Positions the deque
+	still holds keep their original speech sequence; older ones are rebuilt from
+	the archived text.
+	"""
+
+	def __init__(self, history_deque):
+		self.history = history_deque
+		self.archive = None
+
+	def __len__(self):
+		if self.archive is not None:
+			return max(len(self.history), len(self.archive))
+		return len(self.history)
+
+	def __getitem__(self, index):
+		if index < len(self.history) or self.archive is None:
+			return self.history[index]
+		timestamp, text = self.archive.get(index)
+		return SpeechHistoryEntry(sequence=(text,), timestamp=timestamp)
 
 
 class SpeechNavigator:
@@ -29,7 +204,8 @@ class SpeechNavigator:
 		return None
 
 	def move_forward(self):
-		target_index = self.current_index - 1
+		# The history may have shrunk under the navigator since the last move.
+		target_index = min(self.current_index, len(self.history)) - 1
 		if target_index >= -1:
 			self.current_index = target_index
 			if self.current_index == -1:
@@ -37,6 +213,12 @@ class SpeechNavigator:
 			return self.history[self.current_index]
 		return None
 
+	def jump_to(self, index):
+		if 0 <= index < len(self.history):
+			self.current_index = index
+			return self.history[index]
+		return None
+
 	def has_previous(self):
 		return (self.current_index + 1) < len(self.history)
 
@@ -45,13 +227,31 @@ class SpeechNavigator:
 
 
 class SpeechHistoryHandler:
-	def __init__(self, maxlen=500, callback=None):
-		self.history = deque(maxlen=maxlen)
+	def __init__(self, budget_bytes=DEFAULT_HISTORY_BUDGET_BYTES, callback=None, async_capture=True):
+		self.history = deque()
+		self.budget_bytes = budget_bytes
+		self.history_bytes = 0
 		self.callback = callback
 		self._orig_speak = None
 		self._patched = False
+		self.async_capture = async_capture
+		self._pending = deque(maxlen=CAPTURE_QUEUE_SIZE)
+		self._pending_event = threading.Event()
+		self._process_lock = threading.Lock()
+		self._worker = None
+		self._worker_running = False
+		self._echo_dedup = EchoDeduplicator()
+		self.fragments = FragmentTable()
+		self.archive = None
+		# Entries recorded this session, and how many of them the archive already holds.
+		self._recorded_count = 0
+		self._archived_count = 0
+		self.search_index = SpeechSearchIndex()
 		self._setup_storage()
-		self.navigator = SpeechNavigator(self.history)
+		self.view = SpeechHistoryView(self.history)
+		self.navigator = SpeechNavigator(self.view)
+		if self.async_capture:
+			self._start_worker()
 		self.patch_speech()
 
 	def _setup_storage(self):
@@ -61,11 +261,9 @@ class SpeechHistoryHandler:
 		if not os.path.exists(self.history_dir):
 			os.makedirs(self.history_dir)
 
-		try:
-			with open(self.history_file, "w", encoding="utf-8") as f:
-				f.write("")
-		except Exception as e:
-			log.error(f"Failed to initialize log file: {e}")
+		# Each session starts a fresh log; the previous one is kept as a rotated backup.
+		self.log_writer = SpeechLogWriter(self.history_file)
+		self.log_writer.rotate()
 
 	def patch_speech(self):
 		try:
@@ -89,6 +287,95 @@ class SpeechHistoryHandler:
 				speech.speak = self._orig_speak
 			self._patched = False
 			log.info("Speech interception restored")
+		self._stop_worker()
+		self.log_writer.close()
+		self.set_persistent(False)
+
+	def set_persistent(self, enabled, retention_days=14):
+		"""Opens or closes the on-disk archive that keeps history across sessions."""
+		with self._process_lock:
+			if enabled and self.archive is None:
+				try:
+					archive = SpeechArchive(os.path.join(self.history_dir, "speech_archive"), retention_days)
+				except OSError as e:
+					log.error(f"Failed to open speech archive: {e}")
+					return
+				# Seed with the session's entries it lacks so archive positions line up with the deque.
+				# Entries archived before persistence was last turned off are already there.
+				unarchived = min(self._recorded_count - self._archived_count, len(self.history))
+				for position in range(unarchived - 1, -1, -1):
+					entry = self.history[position]
+					archive.append(entry.text, entry.timestamp)
+				self._archived_count = self._recorded_count
+				self.archive = archive
+				self.view.archive = archive
+				self.search_index.rebuild_from_archive(archive)
+				log.info(f"Speech archive opened with {len(archive)} entries")
+			elif enabled:
+				self.archive.set_retention_days(retention_days)
+			elif self.archive is not None:
+				self._archived_count = self._recorded_count
+				self.view.archive = None
+				self.archive.close()
+				self.archive = None
+				log.info("Speech archive closed")
+
+	def _start_worker(self):
+		self._worker_running = True
+		self._worker = threading.Thread(
+			target=self._worker_loop,
+			name="simpleCopy.speechCapture",
+			daemon=True
+		)
+		self._worker.start()
+
+	def _stop_worker(self):
+		if not self._worker:
+			return
+		self._worker_running = False
+		self._pending_event.set()
+		self._worker.join(timeout=1.0)
+		self._worker = None
+		self.flush()
+
+	def _worker_loop(self):
+		while self._worker_running:
+			self._pending_event.wait()
+			self._pending_event.clear()
+			self.flush()
+
+	def flush(self):
+		"""Processes every utterance still waiting in the capture queue.
+
+		Called by the worker and by readers of the history, so F9 and Shift+F9
+		always see speech that was queued before the key press.
+		"""
+		with self._process_lock:
+			while True:
+				try:
+					sequence, timestamp = self._pending.popleft()
+				except IndexError:
+					break
+				self._record(sequence, timestamp)
+
+	def _evict_over_budget(self):
+		history = self.history
+		while self.history_bytes > self.budget_bytes and len(history) > 1:
+			self._release(history.pop())
+
+	def _release(self, entry):
+		"""Takes a removed entry out of history_bytes, along with fragments no other entry holds."""
+		fragments = self.fragments
+		table_bytes = fragments.size_bytes
+		self.history_bytes -= estimate_entry_size(entry, fragments)
+		fragments.release_sequence(entry.sequence)
+		self.history_bytes -= table_bytes - fragments.size_bytes
+
+	def set_budget(self, budget_bytes):
+		"""Changes the memory budget, evicting the oldest entries if it shrank."""
+		with self._process_lock:
+			self.budget_bytes = budget_bytes
+			self._evict_over_budget()
 
 	def _get_sequence_text(self, seq):
 		if not seq:
@@ -108,18 +395,19 @@ class SpeechHistoryHandler:
 
 		return ""
 
-	def _is_state_echo_duplicate(self, previous_text, current_text):
-		if not previous_text or not current_text:
-			return False
-		previous_without_checkbox_role = previous_text.replace(" check box", " ").strip()
-		previous_tokens = set(previous_without_checkbox_role.lower().split())
-		current_tokens = set(current_text.lower().split())
-		return bool(previous_tokens) and previous_tokens.issubset(current_tokens)
-
 	def _my_speak(self, sequence, *args, **kwargs):
 		if self._orig_speak:
 			self._orig_speak(sequence, *args, **kwargs)
 
+		if self._worker_running:
+			# Keep the speak path to a deque append and an event set; the worker does the rest.
+			self._pending.append((sequence, time.time()))
+			if not self._pending_event.is_set():
+				self._pending_event.set()
+		else:
+			self._record(sequence, time.time())
+
+	def _record(self, sequence, timestamp):
 		try:
 			text_version = self._get_sequence_text(sequence)
 			if not text_version:
@@ -129,10 +417,28 @@ class SpeechHistoryHandler:
 			if not clean_text:
 				return
 
-			if self.history and self._is_state_echo_duplicate(self.history[0].text, clean_text):
-				self.history[0] = SpeechHistoryEntry(sequence=sequence, text=clean_text)
+			# History is charged for the fragments the table holds as well as for the entries.
+			fragments = self.fragments
+			table_bytes = fragments.size_bytes
+			entry = SpeechHistoryEntry(sequence=fragments.intern_sequence(sequence), timestamp=timestamp)
+			self.history_bytes += fragments.size_bytes - table_bytes + estimate_entry_size(entry, fragments)
+			is_echo = self._echo_dedup.advance(clean_text) and bool(self.history)
+			if is_echo:
+				self._release(self.history[0])
+				self.history[0] = entry
+			else:
+				self.history.appendleft(entry)
+				self._recorded_count += 1
+			self._evict_over_budget()
+			self.log_writer.write(clean_text, replaces_last=is_echo)
+			if self.archive is not None:
+				self.archive.append(clean_text, timestamp, replaces_last=is_echo)
+			if is_echo:
+				self.search_index.replace_last(clean_text)
 			else:
-				self.history.appendleft(SpeechHistoryEntry(sequence=sequence, text=clean_text))
+				self.search_index.add(clean_text)
+				if self.archive is None:
+					self.search_index.purge(len(self.history))
 
 			if self.callback:
 				callback_text = clean_text
@@ -140,45 +446,56 @@ class SpeechHistoryHandler:
 					callback_text += "\n"
 				self.callback(callback_text)
 		except Exception as e:
-			log.error(f"MySpeak processing error: {e}")
+			log.error(f"Speech capture processing error: {e}")
 
 	def get_latest_sequence(self):
-		return self.history[0].sequence if self.history else None
+		self.flush()
+		return list(self.history[0].sequence) if self.history else None
 
 	def get_latest_text(self):
+		self.flush()
 		return self.history[0].text if self.history else ""
 
 	def open_history_file(self):
-		lines = []
-		for entry in self.history:
-			if entry.text:
-				lines.append(entry.text)
-
-		seen = set()
-		unique_lines = []
-		for line in lines:
-			if line and line not in seen:
-				seen.add(line)
-				unique_lines.append(line)
-
+		self.flush()
+		self.log_writer.flush()
 		try:
-			with open(self.history_file, "w", encoding="utf-8") as f:
-				f.write("\n".join(unique_lines))
+			if not os.path.exists(self.history_file):
+				open(self.history_file, "a", encoding="utf-8").close()
 			os.startfile(self.history_file)
 		except Exception as e:
 			log.error(f"File access error: {e}")
 
 	def get_previous_sequence(self):
-		if not self.history or not self.navigator.has_previous():
+		self.flush()
+		if not self.view or not self.navigator.has_previous():
 			return None
 		entry = self.navigator.move_backward()
-		return entry.sequence if entry else None
+		return list(entry.sequence) if entry else None
 
 	def get_next_sequence(self):
-		if not self.history or not self.navigator.has_next():
+		self.flush()
+		if not self.view or not self.navigator.has_next():
 			return None
 		entry = self.navigator.move_forward()
-		return entry.sequence if entry else None
+		return list(entry.sequence) if entry else None
+
+	def search(self, query):
+		"""Returns newest-first history positions whose text contains every word of query."""
+		self.flush()
+		return self.search_index.search(query, len(self.view))
+
+	def get_entry(self, position):
+		try:
+			return self.view[position]
+		except IndexError:
+			return None
+
+	def jump_to(self, position):
+		"""Moves the navigator to position so Shift+F9 continues from there."""
+		self.flush()
+		entry = self.navigator.jump_to(position)
+		return list(entry.sequence) if entry else None
 
 	def reset_navigation(self):
 		self.navigator.reset()
\ No newline at end of file
@@ -0,0 +1,137 @@
+# text_utils.py
+
+import re
+import threading
+
+# Characters normalize_text keeps even though str.isprintable() rejects them.
+KEPT_WHITESPACE = "\r\n "
+# Size of the pieces normalize_chunks cuts a single large string into.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_ascii_deletions = bytes(
+	code for code in range(128)
+	if not (chr(code).isprintable() or chr(code) in KEPT_WHITESPACE)
+)
+# Above this many distinct unprintable characters, one regex pass beats a replace per character.
+MAX_REPLACED_CHARACTERS = 8
+_suspect_re = None
+_suspect_re_lock = threading.Lock()
+
+
+def _get_suspect_re():
+	"""Matches every unprintable BMP character and every character above the BMP.
+
+	Built on first use. Within the BMP the character class compiles to a
+	bitmap, so scanning stays fast; characters above it are rare enough to be
+	checked one by one.
+	"""
+	global _suspect_re
+	if _suspect_re is None:
+		with _suspect_re_lock:
+			if _suspect_re is None:
+				ranges = []
+				start = None
+				for code in range(0x10000):
+					char = chr(code)
+					unprintable = not (char.isprintable() or char in KEPT_WHITESPACE)
+					if unprintable and start is None:
+						start = code
+					elif not unprintable and start is not None:
+						ranges.append((start, code - 1))
+						start = None
+				if start is not None:
+					ranges.append((start, 0xFFFF))
+				charset = "".join(
+					re.escape(chr(first)) if first == last else f"{re.escape(chr(first))}-{re.escape(chr(last))}"
+					for first, last in ranges
+				)
+				_suspect_re = re.compile(f"[{charset}\U00010000-\U0010ffff]")
+	return _suspect_re
+
+
+def normalize_line_endings(text):
+	"""Converts \\r\\n and lone \\r to \\n."""
+	if "\r" not in text:
+		return text
+	text = text.replace("\r\n", "\n")
+	if "\r" in text:
+		text = text.replace("\r", "\n")
+	return text
+
+
+def to_windows_line_endings(text):
+	return normalize_line_endings(text).replace("\n", "\r\n")
+
+
+def clean_text(text):
+	"""Line endings normalized and surrounding whitespace stripped, as copied text is stored."""
+	return normalize_line_endings(text).strip()
+
+
+def remove_unprintable(text):
+	"""Removes every character str.isprintable() rejects, except line breaks and spaces.
+
+	ASCII text is filtered with bytes.translate. Otherwise one regex pass finds
+	which unprintable characters occur, and only those are removed.
+	"""
+	if text.isascii():
+		return text.encode("ascii").translate(None, _ascii_deletions).decode("ascii")
+	unprintable = [char for char in set(_get_suspect_re().findall(text)) if not char.isprintable()]
+	if not unprintable:
+		return text
+	if len(unprintable) > MAX_REPLACED_CHARACTERS:
+		return re.sub(f"[{''.join(map(re.escape, unprintable))}]", "", text)
+	for char in unprintable:
+		text = text.replace(char, "")
+	return text
+
+
+def normalize_text(text):
+	"""Printable text with \\n line endings, the form content hashes are computed over."""
+	if not text:
+		return ""
+	return normalize_line_endings(remove_unprintable(text))
+
+
+class TextNormalizer:
+	"""Normalizes text that arrives in pieces, as if it had been one string.
+
+	A \\r at the end of a piece is held back until the next piece shows whether
+	it starts a \\r\\n pair.
+	"""
+
+	def __init__(self, strip_unprintable=True):
+		self.strip_unprintable = strip_unprintable
+		self._pending_cr = False
+
+	def feed(self, chunk):
+		if self.strip_unprintable:
+			chunk = remove_unprintable(chunk)
+		if self._pending_cr:
+			chunk = "\r" + chunk
+		self._pending_cr = chunk.endswith("\r")
+		if self._pending_cr:
+			chunk = chunk[:-1]
+		return normalize_line_endings(chunk)
+
+	def finish(self):
+		pending = self._pending_cr
+		self._pending_cr = False
+		return "\n" if pending else ""
+
+
+def normalize_chunks(chunks, strip_unprintable=True):
+	"""Yields the normalized form of an iterable of text pieces."""
+	normalizer = TextNormalizer(strip_unprintable)
+	for chunk in chunks:
+		normalized = normalizer.feed(chunk)
+		if normalized:
+			yield normalized
+	tail = normalizer.finish()
+	if tail:
+		yield tail
+
+
+def iter_chunks(text, chunk_size=DEFAULT_CHUNK_SIZE):
+	for start in range(0, len(text), chunk_size):
+		yield text[start:start + chunk_size]
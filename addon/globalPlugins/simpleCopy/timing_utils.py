@@ -0,0 +1,207 @@
+# timing_utils.py
+
+import os
+import json
+import time
+import threading
+import logging
+from bisect import bisect_left
+
+log = logging.getLogger("nvda.simpleCopy.timing")
+
+# Upper bounds of the histogram buckets in milliseconds; the last bucket is open-ended.
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class LatencyHistogram:
+	def __init__(self):
+		self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+		self.count = 0
+		self.successes = 0
+		self.total_ms = 0.0
+		self.max_ms = 0.0
+
+	def add(self, elapsed_ms, success):
+		self.buckets[bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+		self.count += 1
+		self.total_ms += elapsed_ms
+		if elapsed_ms > self.max_ms:
+			self.max_ms = elapsed_ms
+		if success:
+			self.successes += 1
+
+	def percentile_bound(self, fraction):
+		"""Returns the bucket bound below which at least fraction of the samples fall."""
+		target = fraction * self.count
+		seen = 0
+		for index, bucket in enumerate(self.buckets):
+			seen += bucket
+			if seen >= target:
+				return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else None
+		return None
+
+	def describe(self):
+		def bound(fraction):
+			value = self.percentile_bound(fraction)
+			return f"<= {value} ms" if value is not None else f"> {BUCKET_BOUNDS_MS[-1]} ms"
+
+		mean = self.total_ms / self.count if self.count else 0.0
+		return (
+			f"{self.count} calls, {self.successes} succeeded, mean {mean:.1f} ms, "
+			f"p50 {bound(0.5)}, p90 {bound(0.9)}, max {self.max_ms:.1f} ms"
+		)
+
+
+class _Measurement:
+	def __init__(self, timings, operation, app, strategy):
+		self.timings = timings
+		self.operation = operation
+		self.app = app
+		self.strategy = strategy
+		self.success = False
+
+	def __enter__(self):
+		self._start = time.perf_counter()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		elapsed = time.perf_counter() - self._start
+		self.timings.record(self.operation, self.app, self.strategy, elapsed, self.success and exc_type is None)
+		return False
+
+
+class AppProfiles:
+	"""Per application, which strategy last succeeded for each operation and how long each took.
+
+	Kept across sessions, so the strategy that works in an application is tried
+	first there from the first use.
+	"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		# app -> operation -> {"winner": strategy name, "ms": {strategy name: last elapsed ms}}
+		self._profiles = {}
+
+	def record(self, operation, app, strategy, elapsed_ms, success):
+		if not app:
+			return
+		with self._lock:
+			profile = self._profiles.setdefault(app.lower(), {}).setdefault(operation, {"winner": None, "ms": {}})
+			profile["ms"][strategy] = round(elapsed_ms, 2)
+			if success:
+				profile["winner"] = strategy
+
+	def get_winner(self, operation, app):
+		if not app:
+			return None
+		with self._lock:
+			profile = self._profiles.get(app.lower(), {}).get(operation)
+			return profile["winner"] if profile else None
+
+	def order(self, operation, app, strategies):
+		"""strategies, a tuple of (name, function), with the last winner in app moved to the front."""
+		winner = self.get_winner(operation, app)
+		if winner is None or strategies[0][0] == winner:
+			return strategies
+		first = [item for item in strategies if item[0] == winner]
+		if not first:
+			return strategies
+		return tuple(first) + tuple(item for item in strategies if item[0] != winner)
+
+	def load(self, path):
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				loaded = json.load(f)
+		except FileNotFoundError:
+			return
+		except (OSError, ValueError) as e:
+			log.error(f"Failed to load application profiles: {e}")
+			return
+		if not isinstance(loaded, dict):
+			return
+		with self._lock:
+			for app, operations in loaded.items():
+				if not isinstance(operations, dict):
+					continue
+				for operation, profile in operations.items():
+					if not isinstance(profile, dict):
+						continue
+					winner = profile.get("winner")
+					timings = profile.get("ms")
+					self._profiles.setdefault(app.lower(), {})[operation] = {
+						"winner": winner if isinstance(winner, str) else None,
+						"ms": {
+							name: float(ms) for name, ms in timings.items()
+							if isinstance(ms, (int, float))
+						} if isinstance(timings, dict) else {},
+					}
+
+	def save(self, path):
+		with self._lock:
+			data = json.dumps(self._profiles, indent=1, sort_keys=True)
+		try:
+			temp_path = f"{path}.tmp"
+			with open(temp_path, "w", encoding="utf-8") as f:
+				f.write(data)
+			os.replace(temp_path, path)
+		except OSError as e:
+			log.error(f"Failed to save application profiles: {e}")
+
+
+class StrategyTimings:
+	"""Latency histograms per (operation, app, strategy) for URL and selection retrieval.
+
+	Every measurement also updates profiles, which decides the order strategies are tried in.
+	"""
+
+	def __init__(self, profiles=None):
+		self._lock = threading.Lock()
+		self._histograms = {}
+		self.profiles = profiles if profiles is not None else AppProfiles()
+
+	def record(self, operation, app, strategy, elapsed_seconds, success):
+		key = (operation, app or "unknown", strategy)
+		with self._lock:
+			histogram = self._histograms.get(key)
+			if histogram is None:
+				histogram = self._histograms[key] = LatencyHistogram()
+			histogram.add(elapsed_seconds * 1000, success)
+		self.profiles.record(operation, app, strategy, elapsed_seconds * 1000, success)
+
+	def order(self, operation, app, strategies):
+		return self.profiles.order(operation, app, strategies)
+
+	def measure(self, operation, app, strategy):
+		"""Times a with block; set .success on the returned object when the strategy worked."""
+		return _Measurement(self, operation, app, strategy)
+
+	def report(self):
+		with self._lock:
+			# Stable sort keeps strategies in the order they were first tried.
+			items = sorted(self._histograms.items(), key=lambda item: item[0][:2])
+			lines = []
+			last_group = None
+			for (operation, app, strategy), histogram in items:
+				if (operation, app) != last_group:
+					if lines:
+						lines.append("")
+					lines.append(f"{operation} in {app}:")
+					last_group = (operation, app)
+				lines.append(f"  {strategy}: {histogram.describe()}")
+		return "\n".join(lines)
+
+	def dump_to_log(self):
+		report = self.report()
+		if report:
+			log.info(f"simpleCopy retrieval timings:\n{report}")
+
+	def reset(self):
+		with self._lock:
+			self._histograms.clear()
+
+
+def get_app_name(obj):
+	try:
+		return obj.appModule.appName
+	except AttributeError:
+		return None
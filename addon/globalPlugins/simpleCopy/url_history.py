@@ -4,6 +4,7 @@ import wx
 import os
 import json
 import time
+import shutil
 import threading
 import logging
 import addonHandler
@@ -16,17 +17,165 @@ import speech
 addonHandler.initTranslation()
 log = logging.getLogger(__name__)
 
-MAX_URL_HISTORY_ITEMS = 300
+MAX_URL_HISTORY_ITEMS = 100000
 SAVE_DEBOUNCE_MS = 500
+# Once the journal grows past this, it is folded into a new snapshot in the background.
+JOURNAL_COMPACT_BYTES = 256 * 1024
+SNAPSHOT_VERSION = 2
+
+
+class _URLNode:
+	__slots__ = ("item", "prev", "next")
+
+	def __init__(self, item):
+		self.item = item
+		self.prev = self.next = None
+
+
+class URLHistoryList:
+	"""URL history items, newest first: a linked list indexed by URL.
+
+	Finding a URL, moving it to the front and removing it take constant time,
+	as does dropping the oldest items. Items can also be read by position,
+	like a list. That walks from whichever is nearest of the two ends and the
+	position read last, so reading neighbouring rows, as a list control does,
+	is constant time too.
+	"""
+
+	def __init__(self, items=()):
+		self._root = _URLNode(None)
+		self._root.prev = self._root.next = self._root
+		self._nodes = {}
+		# The node read last and its position; None once a change makes the position unknown.
+		self._cursor = None
+		self._cursorIndex = 0
+		for item in items:
+			self.insert(len(self._nodes), item)
+
+	def __len__(self):
+		return len(self._nodes)
+
+	def __iter__(self):
+		node = self._root.next
+		while node is not self._root:
+			yield node.item
+			node = node.next
+
+	def __getitem__(self, index):
+		return self._nodeAt(index).item
+
+	def get(self, url):
+		node = self._nodes.get(url)
+		return node.item if node else None
+
+	def replace(self, item):
+		"""Replaces the item with the same URL, wherever it is."""
+		self._nodes[item["url"]].item = item
+
+	def insert(self, index, item):
+		"""Puts item at index, first removing any item with the same URL."""
+		if item["url"] in self._nodes:
+			self.remove(item["url"])
+		count = len(self._nodes)
+		index = max(0, min(index, count))
+		following = self._root if index == count else self._nodeAt(index)
+		node = _URLNode(item)
+		node.prev = following.prev
+		node.next = following
+		following.prev.next = node
+		following.prev = node
+		self._nodes[item["url"]] = node
+		if self._cursor is not None and self._cursorIndex >= index:
+			self._cursorIndex += 1
+
+	def remove(self, url, index=None):
+		"""Removes url's item; index, when known, keeps the last read position usable."""
+		node = self._nodes.pop(url, None)
+		if node is None:
+			return None
+		node.prev.next = node.next
+		node.next.prev = node.prev
+		if index is None:
+			self._cursor = None
+		elif self._cursor is node:
+			# The next item now has the removed one's position.
+			self._cursor = node.next if node.next is not self._root else None
+		elif self._cursorIndex > index:
+			self._cursorIndex -= 1
+		return node.item
+
+	def swap(self, index, other):
+		"""Exchanges the items at two positions, leaving the links as they are."""
+		first = self._nodeAt(index)
+		second = self._nodeAt(other)
+		first.item, second.item = second.item, first.item
+		self._nodes[first.item["url"]] = first
+		self._nodes[second.item["url"]] = second
+
+	def evict_oldest_unpinned(self, count):
+		"""Removes up to count unpinned items, oldest first; returns how many went."""
+		removed = 0
+		node = self._root.prev
+		position = len(self._nodes) - 1
+		while removed < count and node is not self._root:
+			previous = node.prev
+			if not node.item.get("pinned", False):
+				self.remove(node.item["url"], index=position)
+				removed += 1
+			node = previous
+			position -= 1
+		return removed
+
+	def _nodeAt(self, index):
+		count = len(self._nodes)
+		if index < 0:
+			index += count
+		if not 0 <= index < count:
+			raise IndexError("URL history index out of range")
+		if index <= count - 1 - index:
+			node, position = self._root.next, 0
+		else:
+			node, position = self._root.prev, count - 1
+		if self._cursor is not None and abs(self._cursorIndex - index) < abs(position - index):
+			node, position = self._cursor, self._cursorIndex
+		while position < index:
+			node = node.next
+			position += 1
+		while position > index:
+			node = node.prev
+			position -= 1
+		self._cursor = node
+		self._cursorIndex = index
+		return node
 
 
 class URLHistoryManager:
+	"""URL history, newest first, stored as a snapshot plus an append-only journal.
+
+	Every change is a record numbered with a sequence number. The record is
+	applied to items and queued, and save() appends the queued records to the
+	journal, so the cost of a write does not depend on the size of the
+	history. When the journal passes JOURNAL_COMPACT_BYTES, it is renamed
+	aside and a background thread writes a new snapshot holding the sequence
+	number it covers, then deletes the renamed journal. Loading replays the
+	snapshot, any journal left aside by an interrupted compaction, and the
+	journal. Records the snapshot already covers are skipped, so a crash at
+	any point loses nothing that was saved.
+	"""
 	_is_saving = False
 	_save_timer = None
 
 	def __init__(self):
 		self.data_path = self._get_data_path()
-		self.items = []
+		self.journal_path = f"{os.path.splitext(self.data_path)[0]}.journal"
+		self.compacting_path = f"{self.journal_path}.compacting"
+		self.items = URLHistoryList()
+		self.max_items = MAX_URL_HISTORY_ITEMS
+		self._seq = 0
+		self._pending_records = []
+		self._journal_bytes = 0
+		self._compacting = False
+		self._loaded = threading.Event()
 		self._load_async()
 
 	def _get_data_path(self):
@@ -38,44 +187,85 @@ class URLHistoryManager:
 	def _load_async(self):
 		def _doLoad():
 			try:
-				if not os.path.exists(self.data_path):
-					self.items = []
-					return
+				self._load()
+			finally:
+				self._loaded.set()
+
+		threading.Thread(target=_doLoad, daemon=True).start()
+
+	def _load(self):
+		self.items = URLHistoryList()
+		self._seq = 0
+		try:
+			if os.path.exists(self.data_path):
 				with open(self.data_path, "r", encoding="utf-8") as f:
 					loaded = json.load(f)
-
+				# Before the journal existed the file was a plain list of items.
+				if isinstance(loaded, dict):
+					seq = loaded.get("seq", 0)
+					self._seq = seq if isinstance(seq, int) else 0
+					loaded = loaded.get("items")
 				if isinstance(loaded, list):
-					restoredItems = []
-					for entry in loaded:
-						if isinstance(entry, dict) and entry.get("url"):
-							restoredItems.append({
-								"url": entry.get("url", ""),
-								"pinned": entry.get("pinned", False),
-								"display_name": entry.get("display_name")
-							})
-					self.items = restoredItems
-				else:
-					self.items = []
-			except (OSError, ValueError) as e:
-				log.error(f"Failed to load URL history: {e}")
-				self.items = []
-
-		threading.Thread(target=_doLoad, daemon=True).start()
+					self.items = URLHistoryList(self._restoreItems(loaded))
+		except (OSError, ValueError) as e:
+			log.error(f"Failed to load URL history: {e}")
+		for path in (self.compacting_path, self.journal_path):
+			self._replayJournal(path)
+		try:
+			self._journal_bytes = os.path.getsize(self.journal_path)
+		except OSError:
+			self._journal_bytes = 0
+
+	def _restoreItems(self, entries):
+		restoredItems = []
+		seen = set()
+		for entry in entries:
+			if isinstance(entry, dict) and entry.get("url") and entry["url"] not in seen:
+				seen.add(entry["url"])
+				restoredItems.append({
+					"url": entry.get("url", ""),
+					"pinned": entry.get("pinned", False),
+					"display_name": entry.get("display_name")
+				})
+		return restoredItems
+
+	def _replayJournal(self, path):
+		validBytes = 0
+		try:
+			with open(path, "rb") as f:
+				for line in f:
+					if not line.endswith(b"\n"):
+						# Cut short because NVDA stopped while writing it.
+						log.debug(f"Dropping incomplete URL history journal record in {path}")
+						break
+					validBytes += len(line)
+					try:
+						record = json.loads(line)
+					except ValueError:
+						log.debug(f"Skipping unreadable URL history journal record in {path}")
+						continue
+					if not isinstance(record, dict) or not isinstance(record.get("seq"), int):
+						continue
+					if record["seq"] <= self._seq:
+						continue
+					self._seq = record["seq"]
+					try:
+						self._apply(record)
+					except (KeyError, TypeError, ValueError) as e:
+						log.debug(f"Skipping invalid URL history journal record: {e}")
+			if validBytes < os.path.getsize(path):
+				# Later records are appended, so the incomplete one must not stay in front of them.
+				os.truncate(path, validBytes)
+		except FileNotFoundError:
+			pass
+		except OSError as e:
+			log.error(f"Failed to read URL history journal {path}: {e}")
 
 	def _truncateIfNeeded(self):
-		if len(self.items) <= MAX_URL_HISTORY_ITEMS:
+		excess = len(self.items) - self.max_items
+		if excess <= 0:
 			return
-		excess = len(self.items) - MAX_URL_HISTORY_ITEMS
-		removed = 0
-		keptItems = []
-		for item in self.items:
-			if removed >= excess:
-				keptItems.append(item)
-			elif not item.get("pinned", False):
-				removed += 1
-			else:
-				keptItems.append(item)
-		self.items = keptItems
+		self.items.evict_oldest_unpinned(excess)
 		log.info(f"Truncated URL history to {len(self.items)} items")
 
 	def save(self, immediate=False):
@@ -93,65 +283,156 @@ class URLHistoryManager:
 			return
 		URLHistoryManager._is_saving = True
 		try:
-			uniqueSuffix = int(time.time() * 1000)
-			tempPath = f"{self.data_path}.{uniqueSuffix}.tmp"
+			if self._pending_records:
+				data = "".join(
+					json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+					for record in self._pending_records
+				).encode("utf-8")
+				with open(self.journal_path, "ab") as f:
+					f.write(data)
+				self._pending_records = []
+				self._journal_bytes += len(data)
+			if self._journal_bytes >= JOURNAL_COMPACT_BYTES and not self._compacting:
+				self._startCompaction()
+		except OSError as e:
+			log.error(f"URL history journal write failed: {e}")
+		finally:
+			URLHistoryManager._is_saving = False
+
+	def _startCompaction(self):
+		# Called right after the queued records were written, so the journal covers everything up to self._seq.
+		if os.path.exists(self.compacting_path):
+			# A compaction was interrupted; keep its records until the new snapshot replaces them.
+			with open(self.journal_path, "rb") as src, open(self.compacting_path, "ab") as dst:
+				shutil.copyfileobj(src, dst)
+			os.remove(self.journal_path)
+		else:
+			os.replace(self.journal_path, self.compacting_path)
+		self._journal_bytes = 0
+		self._compacting = True
+		# Items are replaced rather than changed in place, so a copy of the list is a consistent snapshot.
+		items = list(self.items)
+		seq = self._seq
+		threading.Thread(target=self._compact, args=(items, seq), name="simpleCopy.urlHistoryCompaction", daemon=True).start()
+
+	def _compact(self, items, seq):
+		try:
+			tempPath = f"{self.data_path}.{int(time.time() * 1000)}.tmp"
+			# json.dumps encodes in C, unlike json.dump, which streams through the Python encoder.
+			data = json.dumps({"version": SNAPSHOT_VERSION, "seq": seq, "items": items}, ensure_ascii=False, separators=(",", ":"))
 			with open(tempPath, "w", encoding="utf-8") as f:
-				json.dump(self.items, f, ensure_ascii=False, indent=2)
+				f.write(data)
 			os.replace(tempPath, self.data_path)
+			os.remove(self.compacting_path)
+			log.debug(f"Compacted URL history journal into a snapshot of {len(items)} items")
 		except OSError as e:
-			log.error(f"Async URL history save failed: {e}")
+			log.error(f"URL history compaction failed: {e}")
 		finally:
-			URLHistoryManager._is_saving = False
+			self._compacting = False
+
+	def _commit(self, record, save=True, immediate=False, index=None):
+		"""Applies, numbers and queues a change; index is where the item it concerns is, if known."""
+		# Changes made before the history finished loading would be numbered below the stored ones.
+		self._loaded.wait()
+		self._seq += 1
+		record["seq"] = self._seq
+		self._apply(record, index)
+		self._pending_records.append(record)
+		if save:
+			self.save(immediate=immediate)
+
+	def _apply(self, record, index=None):
+		op = record["op"]
+		if op == "add":
+			self._insert([record["url"]], 0)
+		elif op == "insert":
+			self._insert(record["urls"], record["index"])
+		elif op == "clear":
+			keptItems = [item for item in self.items if item.get("pinned", False)] if record["keep_pinned"] else []
+			self.items = URLHistoryList(keptItems)
+		else:
+			item = self.items.get(record["url"])
+			if item is None:
+				return
+			if op == "remove":
+				self.items.remove(record["url"], index)
+			elif op == "edit":
+				self.items.replace(dict(item, display_name=record["display_name"]))
+			elif op == "pin":
+				self.items.replace(dict(item, pinned=bool(record["pinned"])))
+			elif op == "move":
+				if index is None:
+					index = self._find(record["url"])
+				other = index + record["offset"]
+				if 0 <= other < len(self.items):
+					self.items.swap(index, other)
+
+	def _find(self, url):
+		"""The position of url; a linear walk, only needed when replaying moves."""
+		for i, item in enumerate(self.items):
+			if item["url"] == url:
+				return i
+		return None
+
+	def _insert(self, urls, index):
+		existing = {}
+		for url in urls:
+			item = self.items.remove(url)
+			if item is not None:
+				existing[url] = item
+		index = min(index, len(self.items))
+		for offset, url in enumerate(urls):
+			item = existing.get(url)
+			self.items.insert(index + offset, {
+				"url": url,
+				"pinned": item["pinned"] if item else False,
+				"display_name": item.get("display_name") if item else None
+			})
+		self._truncateIfNeeded()
 
 	def add_item(self, url):
 		if not url:
 			return
-		for i, item in enumerate(self.items):
-			if item["url"] == url:
-				pinned = item["pinned"]
-				displayName = item.get("display_name")
-				del self.items[i]
-				self.items.insert(0, {"url": url, "pinned": pinned, "display_name": displayName})
-				self._truncateIfNeeded()
-				self.save()
-				return
+		self._commit({"op": "add", "url": url})
 
-		self.items.insert(0, {"url": url, "pinned": False, "display_name": None})
-		self._truncateIfNeeded()
-		self.save()
+	def add_items(self, urls, index=0, save=True):
+		"""Puts urls at index in the given order, moving any already in history there.
+
+		Returns how many were placed. The batch is one journal record; pass
+		save=False while more batches are coming.
+		"""
+		urls = list(dict.fromkeys(url for url in urls if url))
+		if not urls:
+			return 0
+		self._commit({"op": "insert", "urls": urls, "index": index}, save)
+		return len(urls)
 
 	def remove_item(self, index):
 		if 0 <= index < len(self.items):
-			del self.items[index]
-			self.save()
+			self._commit({"op": "remove", "url": self.items[index]["url"]}, index=index)
 
 	def edit_item(self, index, new_display_name):
 		if 0 <= index < len(self.items):
-			self.items[index]["display_name"] = new_display_name if new_display_name and new_display_name.strip() else None
-			self.save()
+			displayName = new_display_name if new_display_name and new_display_name.strip() else None
+			self._commit({"op": "edit", "url": self.items[index]["url"], "display_name": displayName})
 
 	def toggle_pin(self, index):
 		if 0 <= index < len(self.items):
-			self.items[index]["pinned"] = not self.items[index]["pinned"]
-			self.save()
+			self._commit({"op": "pin", "url": self.items[index]["url"], "pinned": not self.items[index]["pinned"]})
 
 	def move_up(self, index):
 		if 0 < index < len(self.items):
-			self.items[index], self.items[index - 1] = self.items[index - 1], self.items[index]
-			self.save()
+			self._commit({"op": "move", "url": self.items[index]["url"], "offset": -1}, index=index)
 
 	def move_down(self, index):
 		if 0 <= index < len(self.items) - 1:
-			self.items[index], self.items[index + 1] = self.items[index + 1], self.items[index]
-			self.save()
+			self._commit({"op": "move", "url": self.items[index]["url"], "offset": 1}, index=index)
 
 	def clear_all(self):
-		self.items.clear()
-		self.save(immediate=True)
+		self._commit({"op": "clear", "keep_pinned": False}, immediate=True)
 
 	def clear_non_pinned(self):
-		self.items = [item for item in self.items if item.get("pinned", False)]
-		self.save(immediate=True)
+		self._commit({"op": "clear", "keep_pinned": True}, immediate=True)
 
 
 class EditURLDialog(wx.Dialog):
@@ -204,6 +485,21 @@ class EditURLDialog(wx.Dialog):
 		self.EndModal(wx.ID_CANCEL)
 
 
+class URLHistoryListCtrl(wx.ListCtrl):
+	"""Virtual list of a URLHistoryManager's items; a row's text is read only when it is shown."""
+
+	def __init__(self, parent, manager):
+		super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL | wx.LC_NO_HEADER)
+		self.manager = manager
+
+	def OnGetItemText(self, item, column):
+		try:
+			entry = self.manager.items[item]
+		except IndexError:
+			return ""
+		return entry.get("display_name") or entry["url"]
+
+
 class URLHistoryDialog(wx.Dialog):
 	def __init__(self, parent, manager, plugin):
 		super().__init__(parent, title=_("URL History"), size=(600, 400),
@@ -221,7 +517,7 @@ class URLHistoryDialog(wx.Dialog):
 		panel = wx.Panel(self)
 		sizer = wx.BoxSizer(wx.VERTICAL)
 
-		self.listCtrl = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL | wx.LC_NO_HEADER)
+		self.listCtrl = URLHistoryListCtrl(panel, self.manager)
 		self.listCtrl.InsertColumn(0, _("URL"), width=550)
 		sizer.Add(self.listCtrl, 1, wx.EXPAND | wx.ALL, 5)
 
@@ -232,24 +528,28 @@ class URLHistoryDialog(wx.Dialog):
 		self.listCtrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self._onActivate)
 
 	def update_list(self):
-		selectedDataIdx = self._getSelectedIndex()
-		self.listCtrl.DeleteAllItems()
-		for idx, item in enumerate(self.manager.items):
-			displayText = item.get("display_name") or item["url"]
-			listIdx = self.listCtrl.InsertItem(self.listCtrl.GetItemCount(), displayText)
-			self.listCtrl.SetItemData(listIdx, idx)
-
-		if selectedDataIdx is not None and selectedDataIdx < len(self.manager.items):
-			for pos in range(self.listCtrl.GetItemCount()):
-				if self.listCtrl.GetItemData(pos) == selectedDataIdx:
-					self.listCtrl.Select(pos)
-					self.listCtrl.Focus(pos)
-					self.listCtrl.EnsureVisible(pos)
-					break
-		elif self.listCtrl.GetItemCount() > 0:
+		"""Resynchronizes the row count and redraws the visible rows, keeping the selected position."""
+		selectedIdx = self._getSelectedIndex()
+		count = len(self.manager.items)
+		self.listCtrl.SetItemCount(count)
+		self.listCtrl.Refresh()
+		if selectedIdx is not None and selectedIdx < count:
+			self._restoreSelection(selectedIdx)
+		elif count > 0:
 			self.listCtrl.Select(0)
 			self.listCtrl.Focus(0)
 
+	def _refreshRows(self, first, last):
+		"""Updates the row count and redraws the rows from first to last that are on screen."""
+		count = len(self.manager.items)
+		if self.listCtrl.GetItemCount() != count:
+			self.listCtrl.SetItemCount(count)
+		top = self.listCtrl.GetTopItem()
+		first = max(first, top)
+		last = min(last, count - 1, top + self.listCtrl.GetCountPerPage())
+		if first <= last:
+			self.listCtrl.RefreshItems(first, last)
+
 	def _onShow(self, event):
 		if event.IsShown():
 			wx.CallAfter(self._focusFirstItem)
@@ -265,7 +565,7 @@ class URLHistoryDialog(wx.Dialog):
 		selected = self.listCtrl.GetFirstSelected()
 		if selected == -1:
 			return None
-		return self.listCtrl.GetItemData(selected)
+		return selected
 
 	def _restoreSelection(self, idx):
 		if 0 <= idx < self.listCtrl.GetItemCount():
@@ -292,7 +592,11 @@ class URLHistoryDialog(wx.Dialog):
 		idx = self._getSelectedIndex()
 		if idx is not None:
 			self.manager.remove_item(idx)
-			self.update_list()
+			# Every row from idx on moved up by one.
+			count = len(self.manager.items)
+			self._refreshRows(idx, count - 1)
+			if count:
+				self._restoreSelection(min(idx, count - 1))
 			ui.message(_("Deleted"))
 
 	def _onEdit(self, event):
@@ -303,7 +607,7 @@ class URLHistoryDialog(wx.Dialog):
 		dlg = EditURLDialog(self, _("Edit URL"), item["url"], item.get("display_name"))
 		if dlg.ShowModal() == wx.ID_OK:
 			self.manager.edit_item(idx, dlg.resultDisplayName)
-			self.update_list()
+			self._refreshRows(idx, idx)
 			ui.message(_("Item edited"))
 		dlg.Destroy()
 
@@ -311,35 +615,29 @@ class URLHistoryDialog(wx.Dialog):
 		idx = self._getSelectedIndex()
 		if idx is None:
 			return
-		currentIdx = idx
-		self.manager.toggle_pin(currentIdx)
-		self.update_list()
-		wx.CallAfter(self._restoreSelection, currentIdx)
-		isPinned = self.manager.items[currentIdx].get("pinned", False)
+		self.manager.toggle_pin(idx)
+		self._refreshRows(idx, idx)
+		isPinned = self.manager.items[idx].get("pinned", False)
 		ui.message(_("Pinned") if isPinned else _("Unpinned"))
 
 	def _onMoveUp(self, event):
 		idx = self._getSelectedIndex()
 		if idx is not None:
 			self.manager.move_up(idx)
-			self.update_list()
 			newIdx = idx - 1
 			if newIdx >= 0:
-				self.listCtrl.Select(newIdx)
-				self.listCtrl.Focus(newIdx)
-				self.listCtrl.EnsureVisible(newIdx)
+				self._refreshRows(newIdx, idx)
+				self._restoreSelection(newIdx)
 			ui.message(_("Moved up"))
 
 	def _onMoveDown(self, event):
 		idx = self._getSelectedIndex()
 		if idx is not None:
 			self.manager.move_down(idx)
-			self.update_list()
 			newIdx = idx + 1
 			if newIdx < len(self.manager.items):
-				self.listCtrl.Select(newIdx)
-				self.listCtrl.Focus(newIdx)
-				self.listCtrl.EnsureVisible(newIdx)
+				self._refreshRows(idx, newIdx)
+				self._restoreSelection(newIdx)
 			ui.message(_("Moved down"))
 
 	def _onClear(self, event):
@@ -3,24 +3,52 @@
 import addonHandler
 addonHandler.initTranslation()
 
+import time
+import weakref
+from collections import OrderedDict
 import api
+import core
 import browseMode
 import controlTypes
+import textInfos
 import NVDAObjects
 import UIAHandler
 import logging
+from .timing_utils import StrategyTimings, get_app_name
+
+DEFAULT_BROWSER_APPS = ("chrome", "firefox", "edge", "msedge", "opera", "safari", "brave", "vivaldi", "thorium", "chromium")
+URL_CACHE_ENTRIES = 32
+# Delay after focus settles before the URL is fetched in advance.
+PREFETCH_DELAY_MS = 300
+# Time spent collecting links before giving NVDA back control, and the pause before continuing.
+HARVEST_SLICE_SECONDS = 0.03
+HARVEST_SLICE_PAUSE_MS = 10
+# Most links one collection adds, so a huge page cannot crowd the rest of URL history out.
+MAX_HARVEST_LINKS = 2000
 
 class URLHandler:
 	
-	def __init__(self):
+	def __init__(self, timings=None):
 		self.logger = logging.getLogger(__name__)
-		self.browser_apps = ["chrome", "firefox", "edge", "msedge", "opera", "safari", "brave"]
+		self.timings = timings if timings is not None else StrategyTimings()
+		self.browser_apps = frozenset(DEFAULT_BROWSER_APPS)
+		# Current URL per browse mode document: id(treeInterceptor) -> (weak reference, URL).
+		# Entries last until the document loads a new page or changes title.
+		self._url_cache = OrderedDict()
+		self._prefetch_timer = None
+		# Documents already prefetched since their last load, whether or not a URL was found.
+		self._prefetched = weakref.WeakSet()
 	
 	def is_browser_app(self, obj):
 		if not obj or not obj.appModule:
 			return False
 		return obj.appModule.appName.lower() in self.browser_apps
 	
+	def set_browser_apps(self, names):
+		"""Sets the browser process names from a comma separated string, such as the browserApps setting."""
+		apps = frozenset(name.strip().lower() for name in names.split(",") if name.strip())
+		self.browser_apps = apps or frozenset(DEFAULT_BROWSER_APPS)
+	
 	def _is_valid_url(self, url):
 		if not url or not isinstance(url, str):
 			return False
@@ -35,29 +63,115 @@ class URLHandler:
 		if not focus:
 			return None
 		
-		# Try document IAccessible first (covers file:// and other protocols)
-		url = self._get_url_from_iaccessible_document(focus)
-		if url:
-			return url
-		
-		# Try treeInterceptor
-		url = self._get_url_from_tree_interceptor(focus)
-		if url:
-			return url
-		
-		# Try UIA
-		url = self._get_url_from_uia(focus)
+		tree_interceptor = self._get_document(focus)
+		app = get_app_name(focus)
+		# Measured apart from the strategies, so a cache hit does not count as a strategy win.
+		with self.timings.measure("cached URL", app, "cache") as measurement:
+			url = self._get_cached_url(tree_interceptor)
+			if url:
+				# A single-page app can change its URL without changing the title, which no
+				# event reports, so a hit is checked against the document's own URL where it has one.
+				current_url = self._get_url_from_tree_interceptor(focus)
+				if current_url and current_url != url:
+					self._cache_url(tree_interceptor, current_url)
+					url = current_url
+			measurement.success = bool(url)
 		if url:
 			return url
-		
-		# Try appModule
-		url = self._get_url_from_appmodule(focus)
+		url = self._find_current_url(focus, app)
 		if url:
+			self._cache_url(tree_interceptor, url)
 			return url
 		
 		self.logger.warning("Could not retrieve current URL")
 		return None
 	
+	def schedule_prefetch(self, obj):
+		"""Fetches the URL of obj's document shortly after it gains focus, once per page load."""
+		if not self.is_browser_app(obj):
+			return
+		# Focus moving within a document that was already prefetched needs no strategy walk.
+		tree_interceptor = self._get_document(obj)
+		if tree_interceptor is None or tree_interceptor in self._prefetched:
+			return
+		self.cancel_prefetch()
+		self._prefetch_timer = core.callLater(PREFETCH_DELAY_MS, self._prefetch, obj)
+	
+	def cancel_prefetch(self):
+		if self._prefetch_timer is not None:
+			self._prefetch_timer.Stop()
+			self._prefetch_timer = None
+	
+	def _prefetch(self, obj):
+		self._prefetch_timer = None
+		focus = api.getFocusObject()
+		tree_interceptor = self._get_document(focus)
+		# Focus has left obj's document since the event; the next focus event schedules its own prefetch.
+		if tree_interceptor is None or tree_interceptor is not self._get_document(obj):
+			return
+		self._prefetched.add(tree_interceptor)
+		if self._get_cached_url(tree_interceptor):
+			return
+		url = self._find_current_url(focus, get_app_name(focus))
+		if url:
+			self._cache_url(tree_interceptor, url)
+	
+	def has_cached_urls(self):
+		return bool(self._url_cache)
+	
+	def invalidate_url(self, obj):
+		"""Forgets the cached URL of obj's document, after it loaded a new page or changed title."""
+		if not self._url_cache and not self._prefetched:
+			return
+		tree_interceptor = self._get_document(obj)
+		if tree_interceptor is not None:
+			self._url_cache.pop(id(tree_interceptor), None)
+			self._prefetched.discard(tree_interceptor)
+	
+	def _get_document(self, obj):
+		# Only browse mode documents are cached: a browser window handle is shared by all its tabs.
+		tree_interceptor = getattr(obj, 'treeInterceptor', None)
+		if isinstance(tree_interceptor, browseMode.BrowseModeDocumentTreeInterceptor):
+			return tree_interceptor
+		return None
+	
+	def _get_cached_url(self, tree_interceptor):
+		if tree_interceptor is None:
+			return None
+		entry = self._url_cache.get(id(tree_interceptor))
+		if entry is None:
+			return None
+		owner_ref, url = entry
+		if owner_ref() is not tree_interceptor:
+			del self._url_cache[id(tree_interceptor)]
+			return None
+		self._url_cache.move_to_end(id(tree_interceptor))
+		return url
+	
+	def _cache_url(self, tree_interceptor, url):
+		if tree_interceptor is None:
+			return
+		self._url_cache[id(tree_interceptor)] = (weakref.ref(tree_interceptor), url)
+		self._url_cache.move_to_end(id(tree_interceptor))
+		while len(self._url_cache) > URL_CACHE_ENTRIES:
+			self._url_cache.popitem(last=False)
+	
+	def _find_current_url(self, focus, app):
+		strategies = (
+			# Document IAccessible first (covers file:// and other protocols)
+			("IAccessible document", self._get_url_from_iaccessible_document),
+			("treeInterceptor", self._get_url_from_tree_interceptor),
+			("UIA", self._get_url_from_uia),
+			("appModule", self._get_url_from_appmodule),
+		)
+		for name, strategy in self.timings.order("current URL", app, strategies):
+			with self.timings.measure("current URL", app, name) as measurement:
+				url = strategy(focus)
+				measurement.success = bool(url)
+			if url:
+				return url
+		return None
+	
 	def _get_url_from_tree_interceptor(self, focus):
 		try:
 			if hasattr(focus, 'treeInterceptor') and focus.treeInterceptor:
@@ -116,14 +230,14 @@ class URLHandler:
 			return None
 		
 		if obj.role == controlTypes.Role.LINK:
-			url = self._extract_link_url(obj)
+			url = self.extract_link_url(obj)
 			if url:
 				return url
 		
 		current = obj
 		for _ in range(5):
 			if current.role == controlTypes.Role.LINK:
-				url = self._extract_link_url(current)
+				url = self.extract_link_url(current)
 				if url:
 					return url
 			if hasattr(current, 'parent') and current.parent:
@@ -133,22 +247,154 @@ class URLHandler:
 		
 		return None
 	
-	def _extract_link_url(self, link_obj):
+	def extract_link_url(self, link_obj):
+		strategies = (
+			("value", self._get_link_value),
+			("UIA value", self._get_link_uia_value),
+			("IAccessible value", self._get_link_iaccessible_value),
+		)
+		app = get_app_name(link_obj)
+		for name, strategy in self.timings.order("link URL", app, strategies):
+			with self.timings.measure("link URL", app, name) as measurement:
+				try:
+					url = strategy(link_obj)
+				except Exception as e:
+					self.logger.warning(f"Extract link URL using {name} failed: {e}")
+					url = None
+				measurement.success = self._is_valid_url(url)
+			if measurement.success:
+				return url
+		return None
+	
+	def _get_link_value(self, link_obj):
+		return getattr(link_obj, 'value', None)
+	
+	def _get_link_uia_value(self, link_obj):
+		if hasattr(link_obj, 'UIAElement'):
+			return link_obj.UIAElement.currentValue
+		return None
+	
+	def _get_link_iaccessible_value(self, link_obj):
+		if hasattr(link_obj, 'IAccessibleObject'):
+			return link_obj.IAccessibleObject.accValue(0)
+		return None
+	
+	def harvest_links(self, obj, on_links, on_done):
+		"""Starts collecting the URLs of every link in obj's browse mode document.
+		
+		Only links in the selection are collected when there is one. Returns the
+		started LinkHarvestJob, or None when obj is not in a browse mode document.
+		"""
+		tree_interceptor = self._get_document(obj)
+		if tree_interceptor is None:
+			return None
+		text_range = None
 		try:
-			if hasattr(link_obj, 'value') and link_obj.value:
-				url = link_obj.value
-				if self._is_valid_url(url):
-					return url
-			
-			if hasattr(link_obj, 'UIAElement'):
-				url = link_obj.UIAElement.currentValue
-				if self._is_valid_url(url):
-					return url
-			
-			if hasattr(link_obj, 'IAccessibleObject'):
-				url = link_obj.IAccessibleObject.accValue(0)
-				if self._is_valid_url(url):
-					return url
+			selection = tree_interceptor.makeTextInfo(textInfos.POSITION_SELECTION)
+			if not selection.isCollapsed:
+				text_range = selection
+		except (RuntimeError, NotImplementedError) as e:
+			self.logger.debug(f"No selection to collect links from: {e}")
+		job = LinkHarvestJob(self, tree_interceptor, text_range, on_links, on_done)
+		job.start()
+		return job
+
+
+def iter_link_nodes(tree_interceptor, start=None):
+	"""Iterates the quick navigation link items of a browse mode document from start.
+	
+	NVDA has no public iterator over quick navigation items. Its own quick
+	navigation and Elements List use BrowseModeTreeInterceptor._iterNodesByType,
+	which every browse mode document implements, so the add-on depends on it
+	deliberately, and only here. A document without it yields no links.
+	"""
+	iterate = getattr(tree_interceptor, "_iterNodesByType", None)
+	if iterate is None:
+		logging.getLogger(__name__).debug("Document has no quick navigation iterator")
+		return iter(())
+	return iterate("link", "next", start)
+
+
+class LinkHarvestJob:
+	"""Walks a browse mode document's links once, a slice at a time on the main thread.
+	
+	The document is only available on the main thread, so like the review copy
+	the walk runs in short slices scheduled with core.callLater. on_links
+	receives each slice's new URLs in document order; on_done receives the
+	total once the walk ends, and whether it stopped early because max_links
+	URLs were found. Neither is called after cancel().
+	"""
+	
+	def __init__(self, url_handler, tree_interceptor, text_range, on_links, on_done, max_links=MAX_HARVEST_LINKS):
+		self.logger = logging.getLogger(__name__)
+		self.url_handler = url_handler
+		self.max_links = max_links
+		self.on_links = on_links
+		self.on_done = on_done
+		self.cancelled = False
+		self.finished = False
+		self.count = 0
+		self.limit_reached = False
+		self._range = text_range
+		self._seen = set()
+		start = None
+		if text_range is not None:
+			start = text_range.copy()
+			start.collapse()
+			# Nodes are searched for after the start position, so step back over a link starting exactly there.
+			start.move(textInfos.UNIT_CHARACTER, -1)
+		self._nodes = iter_link_nodes(tree_interceptor, start)
+	
+	def start(self):
+		self._run_slice()
+	
+	def cancel(self):
+		if self.finished:
+			return False
+		self.cancelled = True
+		self.finished = True
+		self.logger.info(f"Link harvest cancelled after {self.count} links")
+		return True
+	
+	def _run_slice(self):
+		if self.cancelled:
+			return
+		deadline = time.perf_counter() + HARVEST_SLICE_SECONDS
+		urls = []
+		done = False
+		try:
+			while time.perf_counter() < deadline:
+				item = next(self._nodes, None)
+				if item is None:
+					done = True
+					break
+				if self._range is not None:
+					if item.textInfo.compareEndPoints(self._range, "startToEnd") >= 0:
+						done = True
+						break
+					if item.textInfo.compareEndPoints(self._range, "startToStart") < 0:
+						continue
+				url = self.url_handler.extract_link_url(item.obj)
+				if url and url not in self._seen:
+					self._seen.add(url)
+					urls.append(url)
+					if self.count + len(urls) >= self.max_links:
+						self.logger.info(f"Link harvest stopped at the limit of {self.max_links} links")
+						self.limit_reached = True
+						done = True
+						break
+		except NotImplementedError:
+			self.logger.debug("Document does not support link navigation")
+			done = True
 		except Exception as e:
-			self.logger.warning(f"Extract link URL failed: {e}")
-		return None
\ No newline at end of file
+			self.logger.error(f"Link harvest failed: {e}")
+			done = True
+		if urls:
+			self.count += len(urls)
+			self.on_links(urls)
+		if done:
+			self.finished = True
+			self.logger.info(f"Link harvest collected {self.count} links")
+			self.on_done(self.count, self.limit_reached)
+			return
+		core.callLater(HARVEST_SLICE_PAUSE_MS, self._run_slice)
@@ -0,0 +1,5 @@
+# Stand-in for NVDA's UIA NVDAObject.
+
+
+class UIA:
+	pass
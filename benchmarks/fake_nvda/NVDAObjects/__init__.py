@@ -0,0 +1,3 @@
+# Stand-in for NVDA's NVDAObjects package.
+
+from . import UIA
@@ -0,0 +1,3 @@
+# Stand-in for NVDA's UIAHandler.
+
+UIA_UrlPropertyId = 30070
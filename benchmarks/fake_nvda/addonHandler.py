@@ -0,0 +1,10 @@
+# Stand-in for NVDA's addonHandler, used by the headless benchmarks.
+
+import builtins
+
+
+def initTranslation():
+	builtins._ = lambda text: text
+
+
+initTranslation()
@@ -0,0 +1,26 @@
+# Stand-in for NVDA's api module, used by the headless benchmarks.
+
+import winUser
+
+_focusObject = None
+_navigatorObject = None
+_reviewPosition = None
+
+
+def copyToClip(text, notify=False):
+	with winUser.openClipboard():
+		winUser.emptyClipboard()
+		winUser.setClipboardData(winUser.CF_UNICODETEXT, text)
+	return True
+
+
+def getFocusObject():
+	return _focusObject
+
+
+def getNavigatorObject():
+	return _navigatorObject
+
+
+def getReviewPosition():
+	return _reviewPosition
@@ -0,0 +1,5 @@
+# Stand-in for NVDA's browseMode.
+
+
+class BrowseModeDocumentTreeInterceptor:
+	pass
@@ -0,0 +1,33 @@
+# Stand-in for NVDA's config; sections return the defaults from their spec.
+
+import re
+
+_defaultRe = re.compile(r"default=([^,)]*)")
+
+
+def _parseDefault(spec):
+	kind = spec.split("(", 1)[0]
+	value = _defaultRe.search(spec).group(1).strip("\"'")
+	if kind == "boolean":
+		return value == "True"
+	if kind == "integer":
+		return int(value)
+	if kind == "float":
+		return float(value)
+	if kind == "string_list":
+		return [] if value in ("list()", "") else value.split(",")
+	return value
+
+
+class _Config(dict):
+	def __init__(self):
+		super().__init__()
+		self.spec = {}
+
+	def __missing__(self, section):
+		values = {key: _parseDefault(spec) for key, spec in self.spec[section].items()}
+		self[section] = values
+		return values
+
+
+conf = _Config()
@@ -0,0 +1,15 @@
+# Stand-in for the parts of NVDA's controlTypes the add-on uses.
+
+import enum
+
+
+class Role(enum.IntEnum):
+	UNKNOWN = 0
+	LINK = 19
+	DOCUMENT = 52
+	EDITABLETEXT = 8
+	TEXTFRAME = 66
+
+
+class State(enum.IntEnum):
+	EDITABLE = 1 << 20
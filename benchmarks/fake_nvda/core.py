@@ -0,0 +1,23 @@
+# Stand-in for NVDA's core; timers never fire on their own.
+
+import wx
+
+_timers = []
+
+
+def callLater(delay, callable, *args, **kwargs):
+	timer = wx.CallLater(delay, callable, *args, **kwargs)
+	_timers.append(timer)
+	return timer
+
+
+def run_pending_timers():
+	"""Fires every timer scheduled through callLater, including ones scheduled meanwhile."""
+	while _timers:
+		timer = _timers.pop(0)
+		if timer.IsRunning():
+			timer.fire()
+
+
+def discard_pending_timers():
+	_timers.clear()
@@ -0,0 +1,5 @@
+# Stand-in for NVDA's eventHandler.
+
+
+class FocusLossCancellableSpeechCommand:
+	pass
@@ -0,0 +1,10 @@
+# Stand-in for NVDA's globalVars; the config path is a throwaway directory removed at exit.
+
+import atexit
+import tempfile
+import types
+
+_config_dir = tempfile.TemporaryDirectory(prefix="simpleCopy-bench-", ignore_cleanup_errors=True)
+atexit.register(_config_dir.cleanup)
+
+appArgs = types.SimpleNamespace(configPath=_config_dir.name)
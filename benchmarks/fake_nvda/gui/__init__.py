@@ -0,0 +1,17 @@
+# Stand-in for NVDA's gui package.
+
+from . import guiHelper
+from . import settingsDialogs
+
+
+class _MainFrame:
+	Handle = 0
+
+	def prePopup(self):
+		pass
+
+	def postPopup(self):
+		pass
+
+
+mainFrame = _MainFrame()
@@ -0,0 +1,6 @@
+# Stand-in for NVDA's gui.guiHelper.
+
+
+class BoxSizerHelper:
+	def __init__(self, parent, sizer=None):
+		pass
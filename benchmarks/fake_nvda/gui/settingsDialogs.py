@@ -0,0 +1,9 @@
+# Stand-in for NVDA's gui.settingsDialogs.
+
+
+class SettingsPanel:
+	pass
+
+
+class NVDASettingsDialog:
+	categoryClasses = []
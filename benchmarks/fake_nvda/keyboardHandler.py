@@ -0,0 +1,14 @@
+# Stand-in for NVDA's keyboardHandler.
+
+
+def injectKey(keyName):
+	pass
+
+
+class KeyboardInputGesture:
+	@classmethod
+	def fromName(cls, name):
+		return cls()
+
+	def send(self):
+		pass
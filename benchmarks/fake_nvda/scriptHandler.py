@@ -0,0 +1,7 @@
+# Stand-in for NVDA's scriptHandler.
+
+
+def script(**kwargs):
+	def decorator(func):
+		return func
+	return decorator
@@ -0,0 +1,5 @@
+# Stand-in for NVDA's speech package. speak is bound at import time, like the
+# real package, so patching speech.speech.speak does not affect speech.speak.
+
+from . import speech
+from .speech import speak
@@ -0,0 +1,5 @@
+# Stand-in for NVDA's speech.speech module; speaking does nothing.
+
+
+def speak(speechSequence, symbolLevel=None, priority=None):
+	pass
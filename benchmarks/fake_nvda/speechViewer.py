@@ -0,0 +1,3 @@
+# Stand-in for NVDA's speechViewer.
+
+SPEECH_ITEM_SEPARATOR = "  "
@@ -0,0 +1,13 @@
+# Stand-in for NVDA's textInfos constants.
+
+POSITION_FIRST = "first"
+POSITION_LAST = "last"
+POSITION_CARET = "caret"
+POSITION_SELECTION = "selection"
+POSITION_ALL = "all"
+UNIT_CHARACTER = "character"
+UNIT_WORD = "word"
+UNIT_LINE = "line"
+UNIT_PARAGRAPH = "paragraph"
+UNIT_PAGE = "page"
+UNIT_STORY = "story"
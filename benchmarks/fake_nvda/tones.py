@@ -0,0 +1,5 @@
+# Stand-in for NVDA's tones module.
+
+
+def beep(hz, length, left=50, right=50):
+	pass
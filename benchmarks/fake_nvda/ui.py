@@ -0,0 +1,9 @@
+# Stand-in for NVDA's ui module.
+
+
+def message(text):
+	pass
+
+
+def browseableMessage(message, title=None, isHtml=False):
+	pass
@@ -0,0 +1,47 @@
+# Stand-in for NVDA's winKernel: global memory handles backed by ctypes buffers.
+
+import ctypes
+import itertools
+import types
+
+_handles = itertools.count(0x1000)
+_memory = {}
+
+
+def GlobalAlloc(flags, size):
+	handle = next(_handles)
+	_memory[handle] = ctypes.create_string_buffer(size)
+	return handle
+
+
+def GlobalLock(handle):
+	buffer = _memory.get(handle)
+	return ctypes.addressof(buffer) if buffer is not None else None
+
+
+def GlobalUnlock(handle):
+	return True
+
+
+def GlobalSize(handle):
+	buffer = _memory.get(handle)
+	return len(buffer) if buffer is not None else 0
+
+
+def GlobalFree(handle):
+	_memory.pop(handle, None)
+	return None
+
+
+def read(handle):
+	return _memory[handle].raw
+
+
+# Plain functions, so callers can set restype and argtypes as on a real DLL export.
+kernel32 = types.SimpleNamespace(
+	GlobalAlloc=GlobalAlloc,
+	GlobalLock=GlobalLock,
+	GlobalUnlock=GlobalUnlock,
+	GlobalSize=GlobalSize,
+	GlobalFree=GlobalFree,
+)
@@ -0,0 +1,96 @@
+# Stand-in for NVDA's winUser clipboard helpers, backed by a dict.
+#
+# Values are either str (CF_UNICODETEXT set through setClipboardData) or winKernel
+# global memory handles (set through user32.SetClipboardData).
+
+import contextlib
+import types
+import winKernel
+
+CF_UNICODETEXT = 13
+
+_clipboard = {}
+_state = {"sequence_number": 1}
+
+
+def _changed():
+	_state["sequence_number"] += 1
+
+
+def GetClipboardSequenceNumber():
+	return _state["sequence_number"]
+
+
+def EnumClipboardFormats(format):
+	formats = list(_clipboard)
+	if not format:
+		return formats[0] if formats else 0
+	try:
+		index = formats.index(format)
+	except ValueError:
+		return 0
+	return formats[index + 1] if index + 1 < len(formats) else 0
+
+
+def GetClipboardData(format):
+	value = _clipboard.get(format)
+	if isinstance(value, str):
+		data = (value + "\0").encode("utf-16-le")
+		handle = winKernel.GlobalAlloc(0, len(data))
+		winKernel._memory[handle].raw = data
+		_clipboard[format] = value = handle
+	return value or 0
+
+
+def SetClipboardData(format, handle):
+	previous = _clipboard.get(format)
+	if isinstance(previous, int):
+		winKernel.GlobalFree(previous)
+	_clipboard[format] = handle
+	_changed()
+	return handle
+
+
+def AddClipboardFormatListener(hwnd):
+	return True
+
+
+def RemoveClipboardFormatListener(hwnd):
+	return True
+
+
+# Plain functions, so callers can set restype and argtypes as on a real DLL export.
+user32 = types.SimpleNamespace(
+	GetClipboardSequenceNumber=GetClipboardSequenceNumber,
+	EnumClipboardFormats=EnumClipboardFormats,
+	GetClipboardData=GetClipboardData,
+	SetClipboardData=SetClipboardData,
+	AddClipboardFormatListener=AddClipboardFormatListener,
+	RemoveClipboardFormatListener=RemoveClipboardFormatListener,
+)
+
+
+@contextlib.contextmanager
+def openClipboard(hwndOwner=None):
+	yield
+
+
+def emptyClipboard():
+	# Like Windows, emptying frees the memory the clipboard owns.
+	for value in _clipboard.values():
+		if isinstance(value, int):
+			winKernel.GlobalFree(value)
+	_clipboard.clear()
+	_changed()
+
+
+def getClipboardData(format):
+	value = _clipboard.get(format)
+	if isinstance(value, int):
+		return winKernel.read(value).decode("utf-16-le").split("\0", 1)[0]
+	return value
+
+
+def setClipboardData(format, data):
+	_clipboard[format] = data
+	_changed()
@@ -0,0 +1,18 @@
+# Stand-in for NVDA's windowUtils; windows get a fake handle and never receive messages on their own.
+
+import itertools
+
+_handles = itertools.count(0x2000)
+
+
+class CustomWindow:
+	className = None
+
+	def __init__(self, windowName=None, windowStyle=0, extendedWindowStyle=0, parent=None):
+		self.handle = next(_handles)
+
+	def windowProc(self, hwnd, msg, wParam, lParam):
+		pass
+
+	def destroy(self):
+		self.handle = None
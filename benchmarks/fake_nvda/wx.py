@@ -0,0 +1,211 @@
+# Stand-in for the parts of wxPython the add-on uses. Windows are inert; the
+# list control keeps its rows in memory so dialog updates can be measured.
+
+
+class CallLater:
+	"""A timer that only runs when fire() is called."""
+
+	def __init__(self, milliseconds, callable, *args, **kwargs):
+		self.callable = callable
+		self.args = args
+		self.kwargs = kwargs
+		self._running = True
+
+	def IsRunning(self):
+		return self._running
+
+	def Stop(self):
+		self._running = False
+
+	def fire(self):
+		self._running = False
+		return self.callable(*self.args, **self.kwargs)
+
+
+def CallAfter(callable, *args, **kwargs):
+	callable(*args, **kwargs)
+
+
+class Window:
+	def __init__(self, parent=None, *args, **kwargs):
+		self._shown = False
+
+	def Bind(self, event, handler, source=None, id=None):
+		pass
+
+	def SetSizer(self, sizer):
+		pass
+
+	def SetFocus(self):
+		pass
+
+	def Show(self, show=True):
+		self._shown = show
+
+	def IsShown(self):
+		return self._shown
+
+	def Close(self):
+		self._shown = False
+
+	def Destroy(self):
+		self._shown = False
+
+	def Raise(self):
+		pass
+
+	def Centre(self):
+		pass
+
+	CentreOnScreen = Centre
+	CentreOnParent = Centre
+
+
+class Dialog(Window):
+	pass
+
+
+class Panel(Window):
+	pass
+
+
+class StaticText(Window):
+	pass
+
+
+class Button(Window):
+	pass
+
+
+class TextCtrl(Window):
+	def __init__(self, parent=None, value="", *args, **kwargs):
+		super().__init__(parent)
+		self._value = value
+
+	def GetValue(self):
+		return self._value
+
+	def SetValue(self, value):
+		self._value = value
+
+
+class CheckBox(TextCtrl):
+	pass
+
+
+class SpinCtrl(TextCtrl):
+	pass
+
+
+class BoxSizer:
+	def __init__(self, orient=0):
+		pass
+
+	def Add(self, *args, **kwargs):
+		pass
+
+
+class Menu:
+	def Append(self, *args, **kwargs):
+		return object()
+
+	def AppendSeparator(self):
+		pass
+
+	def Destroy(self):
+		pass
+
+
+class ListCtrl(Window):
+	def __init__(self, parent=None, *args, style=0, **kwargs):
+		super().__init__(parent)
+		self.style = style
+		self._rows = []
+		self._data = []
+		self._selected = -1
+		self._itemCount = 0
+
+	def InsertColumn(self, col, heading, width=-1):
+		pass
+
+	def InsertItem(self, index, label):
+		self._rows.insert(index, label)
+		self._data.insert(index, 0)
+		return index
+
+	def SetItemText(self, index, label):
+		self._rows[index] = label
+
+	def GetItemText(self, index, col=0):
+		if self.style & LC_VIRTUAL:
+			return self.OnGetItemText(index, col)
+		return self._rows[index]
+
+	def SetItemData(self, index, data):
+		self._data[index] = data
+
+	def GetItemData(self, index):
+		return self._data[index]
+
+	def DeleteItem(self, index):
+		del self._rows[index]
+		del self._data[index]
+
+	def DeleteAllItems(self):
+		self._rows = []
+		self._data = []
+		self._selected = -1
+
+	def GetItemCount(self):
+		if self.style & LC_VIRTUAL:
+			return self._itemCount
+		return len(self._rows)
+
+	def SetItemCount(self, count):
+		self._itemCount = count
+
+	def RefreshItem(self, index):
+		pass
+
+	def RefreshItems(self, first, last):
+		pass
+
+	def Refresh(self):
+		pass
+
+	def GetTopItem(self):
+		return 0
+
+	def GetCountPerPage(self):
+		return 20
+
+	def GetFirstSelected(self):
+		return self._selected
+
+	def Select(self, index, on=True):
+		self._selected = index if on else -1
+
+	def Focus(self, index):
+		pass
+
+	def EnsureVisible(self, index):
+		pass
+
+	def PopupMenu(self, menu):
+		pass
+
+
+LC_REPORT = 0x0020
+LC_VIRTUAL = 0x1000
+LC_SINGLE_SEL = 0x2000
+LC_NO_HEADER = 0x4000
+ID_OK = 5100
+ID_CANCEL = 5101
+ID_ANY = -1
+
+
+def __getattr__(name):
+	# Event types, flags and key codes: any distinct value will do.
+	if name.isupper() or name.startswith(("EVT_", "WXK_")):
+		return hash(name) & 0xFFFF
+	raise AttributeError(name)
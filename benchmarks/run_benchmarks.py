@@ -0,0 +1,695 @@
+"""Headless benchmarks for simpleCopy's hot paths.
+
+Runs on plain CPython. The NVDA and wxPython modules the add-on imports are
+replaced by the stand-ins in fake_nvda, so only the add-on's own code is
+measured. Each benchmark reports operations per second and the p50/p99
+latency of a single operation.
+
+Usage:
+	python benchmarks/run_benchmarks.py [-n ITERATIONS] [NAME_FILTER ...]
+"""
+
+import argparse
+import bisect
+import ctypes
+import os
+import random
+import shutil
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "fake_nvda"))
+sys.path.insert(0, os.path.join(HERE, "..", "addon", "globalPlugins"))
+
+import winKernel  # noqa: E402
+import winUser  # noqa: E402
+
+if not hasattr(ctypes, "WinDLL"):
+	# The add-on loads its own instances of the system DLLs; give it the fakes' exports.
+	_FAKE_DLLS = {"user32": winUser.user32, "kernel32": winKernel.kernel32}
+	ctypes.WinDLL = lambda name, *args, **kwargs: _FAKE_DLLS[name.lower()]
+
+import api  # noqa: E402
+import core  # noqa: E402
+import speech  # noqa: E402
+import browseMode  # noqa: E402
+import controlTypes  # noqa: E402
+from simpleCopy import clipboard_history, clipboard_snapshot, clipboard_utils, reviewCursor, speech_utils, text_utils, url_history, url_utils  # noqa: E402
+
+BENCHMARKS = []
+
+
+def benchmark(name, iterations=None):
+	"""Registers a factory that sets up state and returns the operation to time.
+
+	The factory may also return (operation, teardown).
+	"""
+	def decorator(factory):
+		BENCHMARKS.append((name, factory, iterations))
+		return factory
+	return decorator
+
+
+def browsing_session(count, seed=7):
+	"""Speech sequences resembling a browsing session: roles, names and some paragraphs."""
+	rng = random.Random(seed)
+	roles = [
+		"link", "visited link", "heading level 2", "heading level 3", "clickable", "button",
+		"check box not checked", "check box checked", "list with 5 items", "out of list", "graphic",
+	]
+	names = [f"Item {i}" for i in range(400)] + ["Home", "Products", "About us", "Contact", "Sign in"]
+	words = (
+		"lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+		"incididunt ut labore et dolore magna aliqua"
+	).split()
+	sequences = []
+	for _ in range(count):
+		roll = rng.random()
+		if roll < 0.1:
+			sequences.append([" ".join(rng.choice(words) for _ in range(rng.randint(20, 80)))])
+		elif roll < 0.6:
+			sequences.append([rng.choice(roles), rng.choice(names)])
+		else:
+			sequences.append([rng.choice(names), rng.choice(roles)])
+	return sequences
+
+
+def cycle(items):
+	state = {"i": 0}
+	count = len(items)
+
+	def next_item():
+		item = items[state["i"] % count]
+		state["i"] += 1
+		return item
+	return next_item
+
+
+# Speech capture
+
+@benchmark("speech.speak_baseline")
+def bench_speak_baseline():
+	next_sequence = cycle(browsing_session(5000))
+	speak = speech.speech.speak
+	return lambda: speak(next_sequence())
+
+
+@benchmark("speech.speak_patched_queued")
+def bench_speak_patched_queued():
+	handler = speech_utils.SpeechHistoryHandler(async_capture=True)
+	next_sequence = cycle(browsing_session(5000))
+	return (lambda: speech.speech.speak(next_sequence())), handler.restore_patch
+
+
+@benchmark("speech.speak_patched_inline")
+def bench_speak_patched_inline():
+	handler = speech_utils.SpeechHistoryHandler(async_capture=False)
+	next_sequence = cycle(browsing_session(5000))
+	return (lambda: speech.speech.speak(next_sequence())), handler.restore_patch
+
+
+@benchmark("speech.echo_dedup")
+def bench_echo_dedup():
+	dedup = speech_utils.EchoDeduplicator()
+	handler = speech_utils.SpeechHistoryHandler(async_capture=False)
+	texts = [handler._get_sequence_text(sequence) for sequence in browsing_session(10000)]
+	handler.restore_patch()
+	next_text = cycle(texts)
+	return lambda: dedup.advance(next_text())
+
+
+@benchmark("speech.archive_toggle", iterations=200)
+def bench_archive_toggle():
+	handler = speech_utils.SpeechHistoryHandler(async_capture=False)
+	shutil.rmtree(os.path.join(handler.history_dir, "speech_archive"), ignore_errors=True)
+	for i in range(5):
+		handler._my_speak([f"line {i}"])
+	handler.set_persistent(True)
+
+	def operation():
+		# Turning persistence off and on again must not archive the session a second time.
+		handler.set_persistent(False)
+		handler.set_persistent(True)
+		handler.search_index._backfill_thread.join()
+		assert len(handler.archive) == 5, "the archive was seeded twice"
+		assert handler.search("line 3") == [1]
+
+	def teardown():
+		handler.set_persistent(False)
+		handler.restore_patch()
+	return operation, teardown
+
+
+# URL history
+
+class PreloadedURLHistoryManager(url_history.URLHistoryManager):
+	"""Skips the background load so the items set up by a benchmark are not replaced."""
+
+	def _load_async(self):
+		self._loaded.set()
+
+
+# The URL history limit before the journal and linked list made larger histories practical.
+SMALL_HISTORY_ITEMS = 300
+
+
+def make_url_manager(count, pinned_every=0, max_items=None):
+	"""A manager holding count URLs; by default that is also its limit, so the history is full."""
+	manager = PreloadedURLHistoryManager()
+	manager.max_items = max_items or count
+	manager.items = url_history.URLHistoryList(
+		{
+			"url": f"https://example.com/page/{i}",
+			"pinned": bool(pinned_every) and i % pinned_every == 0,
+			"display_name": None,
+		}
+		for i in range(count)
+	)
+	return manager
+
+
+@benchmark("url_history.add_item_new")
+def bench_url_add_new():
+	manager = make_url_manager(SMALL_HISTORY_ITEMS, pinned_every=10)
+	counter = iter(range(10 ** 9))
+	return lambda: manager.add_item(f"https://example.org/new/{next(counter)}")
+
+
+@benchmark("url_history.add_item_existing")
+def bench_url_add_existing():
+	manager = make_url_manager(SMALL_HISTORY_ITEMS)
+	# Re-adding the oldest URL moves it to the front, the worst case for a list scan.
+	return lambda: manager.add_item(manager.items[-1]["url"])
+
+
+@benchmark("url_history.truncate")
+def bench_url_truncate():
+	manager = make_url_manager(SMALL_HISTORY_ITEMS, pinned_every=3)
+	counter = iter(range(10 ** 9))
+
+	def operation():
+		manager.items.insert(0, {"url": f"https://example.org/{next(counter)}", "pinned": False, "display_name": None})
+		manager._truncateIfNeeded()
+	return operation
+
+
+@benchmark("url_history.add_item_new_100k")
+def bench_url_add_new_100k():
+	manager = make_url_manager(100000, pinned_every=10)
+	counter = iter(range(10 ** 9))
+	return lambda: manager.add_item(f"https://example.org/new/{next(counter)}")
+
+
+@benchmark("url_history.add_item_existing_100k")
+def bench_url_add_existing_100k():
+	manager = make_url_manager(100000)
+	return lambda: manager.add_item(manager.items[-1]["url"])
+
+
+@benchmark("url_history.dialog_rows_100k")
+def bench_url_dialog_rows_100k():
+	manager = make_url_manager(100000)
+	next_start = cycle(range(0, 100000 - 30, 997))
+
+	def operation():
+		# A page of rows somewhere in the list, as a list control asks for them.
+		start = next_start()
+		for index in range(start, start + 30):
+			manager.items[index]
+	return operation
+
+
+@benchmark("url_history.toggle_pin_and_save", iterations=2000)
+def bench_url_toggle_pin_and_save():
+	manager = make_url_manager(SMALL_HISTORY_ITEMS, pinned_every=10)
+	next_index = cycle(range(len(manager.items)))
+
+	def operation():
+		manager.toggle_pin(next_index())
+		manager._performSave()
+	return operation
+
+
+@benchmark("url_history.compact_snapshot_100k", iterations=10)
+def bench_url_compact_snapshot():
+	manager = make_url_manager(100000, pinned_every=10)
+
+	def operation():
+		open(manager.compacting_path, "wb").close()
+		manager._compact(list(manager.items), manager._seq)
+	return operation
+
+
+@benchmark("url_history.dialog_update_list_100k", iterations=200)
+def bench_url_dialog_update_list():
+	manager = make_url_manager(100000, pinned_every=10)
+	dialog = url_history.URLHistoryDialog(None, manager, None)
+	return dialog.update_list
+
+
+@benchmark("url_history.dialog_pin_100k", iterations=2000)
+def bench_url_dialog_pin_100k():
+	manager = make_url_manager(100000)
+	dialog = url_history.URLHistoryDialog(None, manager, None)
+	dialog.listCtrl.Select(50000)
+	return lambda: dialog._onPin(None)
+
+
+@benchmark("url_history.dialog_delete_100k", iterations=2000)
+def bench_url_dialog_delete_100k():
+	manager = make_url_manager(100000)
+	dialog = url_history.URLHistoryDialog(None, manager, None)
+	dialog.listCtrl.Select(50000)
+	return lambda: dialog._onDelete(None)
+
+
+# Clipboard
+
+@benchmark("clipboard.append_to_clipboard")
+def bench_clipboard_append():
+	handler = clipboard_utils.ClipboardHandler()
+	chunk = "Appended line of selected text\r\nwith a second line. " * 2
+	seed = "Existing clipboard text\r\n" * 400
+
+	def operation():
+		current = winUser.getClipboardData(winUser.CF_UNICODETEXT)
+		if not current or len(current) > 1024 * 1024:
+			winUser.setClipboardData(winUser.CF_UNICODETEXT, seed)
+		handler.append_to_clipboard(chunk)
+	return operation
+
+
+@benchmark("clipboard.append_to_1mb_text", iterations=1000)
+def bench_clipboard_append_large():
+	# Repeated appends onto a clipboard the add-on built itself, so nothing is re-read.
+	handler = clipboard_utils.ClipboardHandler()
+	chunk = "Appended line of selected text\r\nwith a second line. " * 2
+	seed = "Existing clipboard text\r\n" * 40000
+
+	def operation():
+		if len(handler.accumulator) > 2 * 1024 * 1024 or not handler.accumulator:
+			winUser.setClipboardData(winUser.CF_UNICODETEXT, seed)
+		handler.append_to_clipboard(chunk)
+	return operation
+
+
+@benchmark("clipboard.normalize_text_100k", iterations=300)
+def bench_clipboard_normalize():
+	handler = clipboard_utils.ClipboardHandler()
+	text = ("Line of text with\ttabs and \x07 control characters\r\n" * 2000)[:100000]
+	return lambda: handler.normalize_text(text)
+
+
+def fill_clipboard(formats):
+	winUser.emptyClipboard()
+	for format_id, data in formats:
+		handle = winKernel.GlobalAlloc(clipboard_snapshot.GMEM_MOVEABLE, len(data))
+		winKernel._memory[handle].raw = data
+		winUser.user32.SetClipboardData(format_id, handle)
+
+
+@benchmark("clipboard.snapshot_restore_8mb", iterations=100)
+def bench_clipboard_snapshot_restore():
+	# A copied image with its HTML and text alternatives: 6 MB DIB, 2 MB HTML.
+	fill_clipboard([
+		(8, bytes(range(256)) * (6 * 4096)),
+		(0xC0A0, b"<p>copied</p>" * (2 * 1024 * 1024 // 13)),
+		(winUser.CF_UNICODETEXT, "copied text\0".encode("utf-16-le")),
+	])
+
+	def operation():
+		snapshot = clipboard_snapshot.ClipboardSnapshot.capture(None)
+		winUser.emptyClipboard()
+		snapshot.restore_if_changed(None)
+	return operation
+
+
+@benchmark("clipboard.snapshot_unchanged_8mb", iterations=100)
+def bench_clipboard_snapshot_unchanged():
+	fill_clipboard([
+		(8, bytes(range(256)) * (6 * 4096)),
+		(0xC0A0, b"<p>copied</p>" * (2 * 1024 * 1024 // 13)),
+	])
+
+	def operation():
+		snapshot = clipboard_snapshot.ClipboardSnapshot.capture(None)
+		snapshot.restore_if_changed(None)
+	return operation
+
+
+@benchmark("clipboard_history.record_and_store")
+def bench_clipboard_history_record():
+	history = clipboard_history.ClipboardHistory()
+	listener = clipboard_history.ClipboardListener(history)
+	texts = [" ".join(sequence) * (1 + i % 50) for i, sequence in enumerate(browsing_session(2000))]
+	next_text = cycle(texts)
+
+	def operation():
+		winUser.setClipboardData(winUser.CF_UNICODETEXT, next_text())
+		listener.windowProc(listener.handle, clipboard_history.WM_CLIPBOARDUPDATE, 0, 0)
+		history.flush()
+
+	def teardown():
+		listener.destroy()
+		history.close()
+	return operation, teardown
+
+
+# Current URL
+
+class FakeAppModule:
+	appName = "firefox"
+
+
+class FakeIAccessible:
+	"""Counts accValue calls, each of which is a COM round trip in NVDA."""
+
+	calls = 0
+
+	def __init__(self, url):
+		self.url = url
+
+	def accValue(self, child):
+		FakeIAccessible.calls += 1
+		return self.url
+
+
+class FakeTreeInterceptor(browseMode.BrowseModeDocumentTreeInterceptor):
+	pass
+
+
+class FakeBrowserObject:
+	appModule = FakeAppModule()
+
+	def __init__(self, role, parent, tree_interceptor, url=None):
+		self.role = role
+		self.parent = parent
+		self.treeInterceptor = tree_interceptor
+		if url:
+			self.IAccessibleObject = FakeIAccessible(url)
+
+
+def browser_focus(depth=8):
+	"""A link nested depth levels inside a browse mode document."""
+	tree_interceptor = FakeTreeInterceptor()
+	obj = FakeBrowserObject(controlTypes.Role.DOCUMENT, None, tree_interceptor, "https://example.com/article")
+	for _ in range(depth):
+		obj = FakeBrowserObject(controlTypes.Role.LINK, obj, tree_interceptor)
+	return obj
+
+
+@benchmark("url.current_url_uncached")
+def bench_current_url_uncached():
+	api._focusObject = browser_focus()
+	handler = url_utils.URLHandler()
+
+	def operation():
+		handler.invalidate_url(api._focusObject)
+		assert handler.get_current_url()
+
+	def teardown():
+		api._focusObject = None
+	return operation, teardown
+
+
+@benchmark("url.current_url_prefetched")
+def bench_current_url_prefetched():
+	api._focusObject = browser_focus()
+	handler = url_utils.URLHandler()
+	handler.schedule_prefetch(api._focusObject)
+	core.run_pending_timers()
+	calls = FakeIAccessible.calls
+
+	def operation():
+		assert handler.get_current_url()
+
+	def teardown():
+		assert FakeIAccessible.calls == calls, "a prefetched URL was fetched again"
+		api._focusObject = None
+	return operation, teardown
+
+
+@benchmark("url.focus_change_cached")
+def bench_focus_change_cached():
+	api._focusObject = browser_focus()
+	handler = url_utils.URLHandler()
+	handler.schedule_prefetch(api._focusObject)
+	core.run_pending_timers()
+	calls = FakeIAccessible.calls
+
+	def operation():
+		handler.schedule_prefetch(api._focusObject)
+		core.run_pending_timers()
+
+	def teardown():
+		assert FakeIAccessible.calls == calls, "focus moving within a cached document fetched its URL again"
+		api._focusObject = None
+	return operation, teardown
+
+
+class FakeLink:
+	appModule = FakeAppModule()
+
+	def __init__(self, url):
+		self.value = url
+
+
+class FakeLinkNode:
+	def __init__(self, offset, url):
+		self.textInfo = offset
+		self.obj = FakeLink(url)
+
+
+class FakeLinkPage(FakeTreeInterceptor):
+	"""A browse mode document with count links, a fifth of them repeats."""
+
+	def __init__(self, count):
+		self.nodes = [FakeLinkNode(i, f"https://example.com/result/{i % (count * 4 // 5)}") for i in range(count)]
+
+	def _iterNodesByType(self, nodeType, direction="next", pos=None):
+		return iter(self.nodes)
+
+	def makeTextInfo(self, position):
+		raise NotImplementedError
+
+
+def bench_link_harvest(count):
+	page = FakeLinkPage(count)
+	focus = FakeBrowserObject(controlTypes.Role.LINK, None, page)
+	handler = url_utils.URLHandler()
+	manager = make_url_manager(SMALL_HISTORY_ITEMS, max_items=url_history.MAX_URL_HISTORY_ITEMS)
+	dialog = url_history.URLHistoryDialog(None, manager, None)
+	state = {}
+
+	def on_links(urls):
+		state["index"] += manager.add_items(urls, index=state["index"], save=False)
+		dialog.update_list()
+
+	def operation():
+		state["index"] = 0
+		handler.harvest_links(focus, on_links, lambda count, limit_reached: state.setdefault("done", []).append(count))
+		core.run_pending_timers()
+		assert state["done"].pop() == min(count * 4 // 5, url_utils.MAX_HARVEST_LINKS)
+	return operation
+
+
+@benchmark("url.harvest_1000_links", iterations=100)
+def bench_link_harvest_1000():
+	return bench_link_harvest(1000)
+
+
+@benchmark("url.harvest_5000_links", iterations=20)
+def bench_link_harvest_5000():
+	return bench_link_harvest(5000)
+
+
+# Text normalization
+
+def large_document(size, non_ascii=False):
+	line = "Line of text with\ttabs and \x07 control characters\r\n"
+	if non_ascii:
+		line = "ข้อความภาษาไทย\u200bพร้อม\ttab และ emoji 😀\r\n"
+	return (line * (size // len(line) + 1))[:size]
+
+
+class FakeDocumentText:
+	"""A document string and the offsets at which its paragraphs start."""
+
+	def __init__(self, text):
+		self.text = text
+		self.paragraph_starts = [0] + [i + 1 for i, char in enumerate(text) if char == "\n" and i + 1 < len(text)]
+
+
+class FakeTextInfo:
+	"""Offset-based TextInfo over a FakeDocumentText, with paragraph movement."""
+
+	def __init__(self, obj, document, start, end):
+		self.obj = obj
+		self.document = document
+		self.start = start
+		self.end = end
+
+	@property
+	def isCollapsed(self):
+		return self.start == self.end
+
+	@property
+	def clipboardText(self):
+		return self.document.text[self.start:self.end]
+
+	text = clipboardText
+
+	def copy(self):
+		return FakeTextInfo(self.obj, self.document, self.start, self.end)
+
+	def collapse(self, end=False):
+		if end:
+			self.start = self.end
+		else:
+			self.end = self.start
+
+	def expand(self, unit):
+		self.start, self.end = 0, len(self.document.text)
+
+	def move(self, unit, direction, endPoint=None):
+		starts = self.document.paragraph_starts
+		index = bisect.bisect_right(starts, self.end)
+		target = min(index + direction - 1, len(starts))
+		moved = target - index + 1
+		if moved <= 0 or self.end >= len(self.document.text):
+			return 0
+		self.end = starts[target] if target < len(starts) else len(self.document.text)
+		if endPoint != "end":
+			self.start = self.end
+		return moved
+
+	def compareEndPoints(self, other, which):
+		mine = self.start if which.startswith("start") else self.end
+		theirs = other.end if which.endswith("End") else other.start
+		return (mine > theirs) - (mine < theirs)
+
+	def setEndPoint(self, other, which):
+		value = other.end if which.endswith("End") else other.start
+		if which.startswith("start"):
+			self.start = value
+		else:
+			self.end = value
+
+
+class FakeDocument:
+	def __init__(self, text, windowHandle=0x10010):
+		self.treeInterceptor = None
+		self.windowHandle = windowHandle
+		self._document = FakeDocumentText(text)
+
+	def makeTextInfo(self, position):
+		if position == "selection":
+			return FakeTextInfo(self, self._document, 0, 0)
+		return FakeTextInfo(self, self._document, 0, len(self._document.text))
+
+
+@benchmark("review.copy_10mb_chunked", iterations=10)
+def bench_review_copy_large():
+	api._focusObject = FakeDocument(large_document(10 * 1024 * 1024))
+	api._reviewPosition = api._focusObject.makeTextInfo(None)
+	handler = reviewCursor.ReviewCursorHandler()
+	results = []
+
+	def operation():
+		handler.invalidate(api._focusObject)
+		handler.copy_from_review_cursor_async(results.append)
+		core.run_pending_timers()
+		assert results.pop()
+
+	def teardown():
+		api._focusObject = api._reviewPosition = None
+	return operation, teardown
+
+
+@benchmark("review.copy_10mb_cached", iterations=1000)
+def bench_review_copy_cached():
+	api._focusObject = FakeDocument(large_document(10 * 1024 * 1024))
+	api._reviewPosition = api._focusObject.makeTextInfo(None)
+	handler = reviewCursor.ReviewCursorHandler()
+	results = []
+	handler.copy_from_review_cursor_async(results.append)
+	core.run_pending_timers()
+
+	def operation():
+		handler.copy_from_review_cursor_async(results.append)
+		assert results.pop()
+
+	def teardown():
+		api._focusObject = api._reviewPosition = None
+	return operation, teardown
+
+
+@benchmark("text.normalize_text_10mb", iterations=20)
+def bench_normalize_text_large():
+	text = large_document(10 * 1024 * 1024)
+	return lambda: text_utils.normalize_text(text)
+
+
+@benchmark("text.normalize_text_10mb_non_ascii", iterations=10)
+def bench_normalize_text_large_non_ascii():
+	text = large_document(10 * 1024 * 1024, non_ascii=True)
+	return lambda: text_utils.normalize_text(text)
+
+
+@benchmark("text.normalize_chunks_10mb", iterations=20)
+def bench_normalize_chunks_large():
+	text = large_document(10 * 1024 * 1024)
+
+	def operation():
+		for chunk in text_utils.normalize_chunks(text_utils.iter_chunks(text)):
+			pass
+	return operation
+
+
+def percentile(sorted_values, fraction):
+	index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+	return sorted_values[index]
+
+
+def run(factory, iterations, warmup):
+	result = factory()
+	operation, teardown = result if isinstance(result, tuple) else (result, None)
+	try:
+		for _ in range(warmup):
+			operation()
+		timings = []
+		clock = time.perf_counter_ns
+		for _ in range(iterations):
+			start = clock()
+			operation()
+			timings.append(clock() - start)
+	finally:
+		if teardown:
+			teardown()
+	timings.sort()
+	total = sum(timings)
+	return {
+		"ops_per_sec": iterations * 1e9 / total if total else float("inf"),
+		"p50_us": percentile(timings, 0.50) / 1000,
+		"p99_us": percentile(timings, 0.99) / 1000,
+	}
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("filters", nargs="*", help="only run benchmarks whose name contains one of these")
+	parser.add_argument("-n", "--iterations", type=int, default=5000, help="iterations per benchmark")
+	parser.add_argument("--warmup", type=int, default=100, help="untimed iterations first")
+	args = parser.parse_args(argv)
+
+	print(f"{'benchmark':<36}{'ops/sec':>14}{'p50 us':>12}{'p99 us':>12}")
+	for name, factory, iterations in BENCHMARKS:
+		if args.filters and not any(f in name for f in args.filters):
+			continue
+		stats = run(factory, min(args.iterations, iterations or args.iterations), args.warmup)
+		print(f"{name:<36}{stats['ops_per_sec']:>14,.0f}{stats['p50_us']:>12.2f}{stats['p99_us']:>12.2f}")
+
+
+if __name__ == "__main__":
+	main()